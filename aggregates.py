@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Cubo pré-agregado: uma única passagem groupby por seleção de filtros, com soma, contagem,
+# soma dos quadrados, mínimo e máximo de cada métrica por (Operador, Equipamento, Talhão, dia)
+KEY_HINTS = ("operador", "equipamento", "talh")
+DAY_COL = "Dia"
+ROWS_COL = "Linhas"
+
+KPI_METRICS = [
+    "Eficiência de Motor (%)",
+    "Área Operacional (ha)",
+    "Consumo Médio (l/ha)",
+    "Rendimento Operacional (ha/h)",
+    "Velocidade Média Efetiva (km/h)",
+    "Tempo Efetivo (h)",
+    "RPM Médio em Efetivo",
+    "Consumo Médio Efetivo (l/h)",
+]
+
+# Colunas procuradas pelos cards e gráficos, além das KPI_METRICS
+CHART_HINTS = ("área operacional", "eficiência de motor", "consumo médio", "rendimento operacional")
+
+
+def find_column(columns, hint):
+    return next((col for col in columns if hint in col.lower()), None)
+
+
+# Métricas do cubo: KPIs, colunas dos gráficos e indicadores customizados, se numéricas
+def cube_metric_columns(columns, num_cols, extra=()):
+    found = [find_column(columns, hint) for hint in CHART_HINTS]
+    return [col for col in dict.fromkeys(KPI_METRICS + found + list(extra)) if col in num_cols]
+
+
+def cube_keys(columns):
+    keys = [find_column(columns, hint) for hint in KEY_HINTS]
+    return [key for key in keys if key is not None]
+
+
+def build_cube(df, keys, metrics, date_col=None):
+    frame = {key: df[key] for key in keys}
+    if date_col:
+        frame[DAY_COL] = df[date_col].dt.normalize()
+    group_cols = list(frame)
+    if not group_cols:
+        frame["_todos"] = np.zeros(len(df), dtype=np.int8)
+        group_cols = ["_todos"]
+    for metric in metrics:
+        values = pd.to_numeric(df[metric], errors="coerce").astype("float64")
+        frame[metric] = values
+        frame[f"{metric}|sumsq"] = values * values
+    grouped = pd.DataFrame(frame, index=df.index).groupby(group_cols, observed=True, dropna=False, sort=False)
+    parts = [grouped.size().rename(ROWS_COL)]
+    if metrics:
+        agg = grouped[metrics].agg(["sum", "count", "min", "max"])
+        agg.columns = [f"{metric}|{stat}" for metric, stat in agg.columns]
+        parts += [agg, grouped[[f"{metric}|sumsq" for metric in metrics]].sum()]
+    return pd.concat(parts, axis=1).reset_index()
+
+
+def _reduce(cube, metric, by=None):
+    how = {
+        f"{metric}|sum": "sum",
+        f"{metric}|count": "sum",
+        f"{metric}|sumsq": "sum",
+        f"{metric}|min": "min",
+        f"{metric}|max": "max",
+    }
+    if by is None:
+        return cube[list(how)].agg(how).to_frame().T
+    return cube.groupby(by, observed=True)[list(how)].agg(how)
+
+
+def _derive(parts, metric, stat):
+    total, n = parts[f"{metric}|sum"], parts[f"{metric}|count"]
+    if stat == "sum":
+        return total
+    if stat == "count":
+        return n
+    if stat in ("min", "max"):
+        return parts[f"{metric}|{stat}"]
+    mean = total / n.where(n > 0)
+    if stat == "mean":
+        return mean
+    if stat == "std":
+        var = (parts[f"{metric}|sumsq"] - total * mean) / (n - 1).where(n > 1)
+        return np.sqrt(var.clip(lower=0))
+    raise ValueError(f"Estatística desconhecida: {stat}")
+
+
+# Estatística de uma métrica no total da seleção (float) ou por chave (Series)
+def metric_stat(cube, metric, stat, by=None):
+    result = _derive(_reduce(cube, metric, by), metric, stat)
+    return float(result.iloc[0]) if by is None else result
+
+
+def has_metric(cube, metric):
+    return f"{metric}|sum" in cube
+
+
+# Valor de um card de KPI; None quando a coluna não existe na aba
+def kpi_value(cube, column, stat):
+    if stat == "nunique":
+        return int(cube[column].nunique()) if column in cube else None
+    return metric_stat(cube, column, stat) if has_metric(cube, column) else None
+
+
+def slice_cube(cube, key, value):
+    return cube[cube[key] == value]
+
+
+# Posições das linhas de cada valor da chave (detalhamento sem nova varredura)
+def row_groups(df, key):
+    return df.groupby(key, observed=True, sort=False).indices
@@ -1,91 +1,339 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import folium
 from streamlit_folium import st_folium
-import io
+import os
+import time
+from aggregates import has_metric, build_cube, cube_keys, cube_metric_columns, find_column, kpi_value, metric_stat, row_groups, slice_cube
+from charts import POINT_BUDGET, figure_payload, grouped_box_figure, histogram_figure, timeseries_figure
+from datetimes import numeric_columns
+from grid import PAGE_SIZES, PREFETCH_PAGES, GridIndex
+from geo import POINT_BUDGET as MAP_POINT_BUDGET, GeoIndex, base_map, build_layer, parse_view
+from exports import export_csv, export_excel, export_key, export_parquet, export_path, export_pdf
+from filters import FilterEngine, filter_columns, filter_rows
+from profiling import current, default_enabled, finish_rerun, instrument_cache, record_payload, span, start_rerun
+from indicators import IndicatorError, compile_indicator
+from maintenance import ALERT_STATUSES, HOURMETER_HINT, RECOMPUTED, SERVICE_STATUSES, STATUS_HINT, RulesEngine, apply_rules, normalize_status
+from ingest import SUPPORTED_TYPES
+from sheet_cache import prepare_sheet, register_workbook, workbook_cached
+from store import AnalyticalStore, StoreView, quote
+from simulator import GRID_AXES, N_DRAWS, OUTPUTS, SIM_METRICS, draw, fit_distributions, scenario_grid, simulate, tornado
 
 # Configuração da página
 st.set_page_config(layout="wide", page_title="Dashboard Operacional", initial_sidebar_state="expanded")
 st.title("📊 Dashboard de Análise Operacional")
 
-# Função para carregar Excel
-@st.cache_data(show_spinner=True)
+# Função para carregar Excel/CSV/TSV/Parquet (abas convertidas para Parquet em segundo plano e lidas sob demanda)
+@instrument_cache(st.cache_data, show_spinner=True)
 def load_excel(file):
-    xls = pd.ExcelFile(file)
-    return {sheet: xls.parse(sheet) for sheet in xls.sheet_names}
-
-# Função para preprocessar dataframe
-@st.cache_data
-def preprocess_df(df):
-    for col in df.columns:
-        if 'date' in col.lower() or 'data' in col.lower() or 'hora' in col.lower():
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except Exception:
-                pass
-    return df
-
-# Função para aplicar filtros
-@st.cache_data
-def apply_filters(df, cat_filters, num_filters, date_col=None, date_range=None):
-    df_filtered = df.copy()
-    if date_col and date_range and len(date_range) == 2:
-        start, end = date_range
-        end = pd.to_datetime(end) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-        df_filtered = df_filtered[
-            (df_filtered[date_col] >= pd.to_datetime(start)) &
-            (df_filtered[date_col] <= end)
-        ]
-    for col, values in cat_filters.items():
-        if values:
-            df_filtered = df_filtered[df_filtered[col].isin(values)]
-    for col, (min_v, max_v) in num_filters.items():
-        df_filtered = df_filtered[(df_filtered[col] >= min_v) & (df_filtered[col] <= max_v)]
-    return df_filtered
-
-# Função para exportar pdf
-def export_pdf(df, title="Relatório Operacional"):
-    from reportlab.lib.pagesizes import letter, landscape
-    from reportlab.pdfgen import canvas
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=landscape(letter))
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(30, 550, title)
-    c.setFont("Helvetica", 12)
-    c.drawString(30, 530, f"Total registros: {len(df)}")
-    x, y = 30, 500
-    colnames = df.columns.tolist()
-    col_h = [str(x)[:13] for x in colnames]
-    c.drawString(30, y, " | ".join(col_h))
-    y -= 18
-    for i, row in df.iterrows():
-        line = " | ".join([str(row[col])[:12] for col in colnames])
-        c.drawString(x, y, line)
-        y -= 18
-        if y < 40:
-            c.showPage()
-            y = 520
-    c.save()
-    buf.seek(0)
-    return buf
-
-uploaded_file = st.file_uploader("Selecione uma planilha Excel...", type=["xlsx"])
-if uploaded_file is not None:
-    all_sheets = load_excel(uploaded_file)
-    sheet_names = list(all_sheets.keys())
-    sheet_selected = st.selectbox("Selecione a aba para análise", sheet_names)
-    df = preprocess_df(all_sheets[sheet_selected])
-    cat_cols = df.select_dtypes(include='object').columns.tolist()
-    num_cols = df.select_dtypes(include='number').columns.tolist()
-    date_cols = df.select_dtypes(include='datetime').columns.tolist()
+    return register_workbook(file.getvalue(), file.name)
+
+# Função para carregar a aba já preprocessada (datas com formato inferido por coluna; cache pela aba,
+# para que os reruns não releiam o Parquet nem refaçam a detecção de datas)
+@instrument_cache(st.cache_data, max_entries=4, show_spinner=False)
+def load_prepared(file_hash, sheet, _progress=None):
+    return prepare_sheet(file_hash, sheet, _progress)
+
+# Função para obter o motor de filtros da aba (índices construídos uma única vez)
+@st.cache_resource(max_entries=16)
+def get_filter_engine(_df, file_hash, sheet, indicator_key=()):
+    return FilterEngine(_df)
+
+# Função para aplicar filtros (sem cópia quando nenhum filtro está ativo)
+def apply_filters(engine, df, cat_filters, num_filters, date_col=None, date_range=None, indicator_key=()):
+    df_filtered, predicates = filter_rows(engine, df, cat_filters, num_filters, date_col, date_range)
+    return df_filtered, (indicator_key, predicates)
+
+# Função para avaliar um indicador customizado (cache por expressão e aba)
+@instrument_cache(st.cache_data, max_entries=64)
+def eval_indicator(_df, file_hash, sheet, expression):
+    return compile_indicator(expression, numeric_columns(_df)).evaluate(_df)
+
+# Função para montar o cubo de agregação da seleção (cache pelo estado dos filtros)
+@instrument_cache(st.cache_data, max_entries=32)
+def get_cube(_df, file_hash, sheet, filter_key, keys, metrics, date_col=None):
+    return build_cube(_df, list(keys), list(metrics), date_col)
+
+# Função para indexar as linhas de cada operador da seleção
+@st.cache_resource(max_entries=8)
+def get_row_groups(_df, file_hash, sheet, filter_key, key):
+    return row_groups(_df, key)
+
+# Função para indexar os pontos GPS da seleção (centro do mapa calculado uma única vez)
+@st.cache_resource(max_entries=8)
+def get_geo_index(_df, file_hash, sheet, filter_key, lat_col, lon_col):
+    return GeoIndex(_df[lat_col].to_numpy(dtype="float64", na_value=float("nan")),
+                    _df[lon_col].to_numpy(dtype="float64", na_value=float("nan")))
+
+# Função para abrir a base consolidada (uma única conexão DuckDB compartilhada por todas as sessões)
+@st.cache_resource
+def get_store():
+    return AnalyticalStore()
+
+# Função para anexar todas as abas do arquivo enviado à base consolidada
+def add_to_store(store, file_hash, file_name, sheet_names):
+    bar = st.progress(0.0, text="Anexando à base consolidada...")
+    for i, sheet in enumerate(sheet_names):
+        if not store.has_source(file_hash, sheet):
+            frame, _ = prepare_sheet(file_hash, sheet)
+            store.append(frame, file_hash, file_name, sheet)
+        bar.progress((i + 1) / len(sheet_names), text=f"Anexando '{sheet}' à base consolidada...")
+    bar.empty()
+
+# Função para montar a visão SQL das abas selecionadas da base (valores e limites dos filtros memorizados)
+@st.cache_resource(max_entries=16)
+def get_store_view(_store, table, sources, indicators, version):
+    return StoreView(_store, table, sources, indicators)
+
+# Função para calcular o cubo da seleção direto no banco (cache pelo estado dos filtros)
+@instrument_cache(st.cache_data, max_entries=32)
+def get_store_cube(_view, table, sources, version, filter_key, keys, metrics, date_col=None):
+    return _view.cube(filter_key[1], list(keys), list(metrics), date_col)
+
+# Função para amostrar as linhas filtradas da base (objeto compartilhado entre sessões, sem cópia)
+@st.cache_resource(max_entries=8)
+def get_store_sample(_view, table, sources, version, filter_key):
+    return _view.sample(filter_key[1]), _view.count(filter_key[1])
+
+# Função para calcular as métricas de manutenção por equipamento direto no banco (todas as linhas filtradas)
+@instrument_cache(st.cache_data, max_entries=16)
+def get_store_equipment(_view, table, sources, version, filter_key, hor_col, status_col, equip_col, order_col, service):
+    return _view.equipment_metrics(filter_key[1], hor_col, status_col, equip_col, order_col, service)
+
+# Função para contar os status de manutenção direto no banco
+@instrument_cache(st.cache_data, max_entries=16)
+def get_store_status_counts(_view, table, sources, version, filter_key, col):
+    return _view.status_counts(filter_key[1], col)
+
+# Função para obter o motor de regras de manutenção da aba (métricas por equipamento memorizadas entre reruns)
+@st.cache_resource(max_entries=8)
+def get_rules_engine(file_hash, sheet, hor_col, status_col, equip_col=None, order_col=None):
+    return RulesEngine(hor_col, status_col, equip_col, order_col)
+
+# Função para indexar uma tabela paginada (ordenações e buscas memorizadas pela seleção)
+@st.cache_resource(max_entries=16)
+def get_grid_index(_df, name, key_parts):
+    return GridIndex(_df)
+
+# Função para exibir uma tabela paginada no servidor: só a página (mais a janela pré-carregada) vai ao navegador
+def paged_table(name, df, key_parts):
+    index = get_grid_index(df, name, key_parts)
+    if not len(index):
+        st.info("Nenhuma linha para exibir.")
+        return
+    columns = st.multiselect("Colunas exibidas", index.columns, default=index.columns, key=f"{name}_colunas") or index.columns
+    col_busca, col_ordem, col_sentido, col_tamanho = st.columns([3, 2, 1, 1])
+    term = col_busca.text_input("Buscar (colunas de texto exibidas)", key=f"{name}_busca")
+    sort_col = col_ordem.selectbox("Ordenar por", [None] + index.columns, key=f"{name}_ordem",
+                                   format_func=lambda col: "Ordem original" if col is None else col)
+    descending = col_sentido.toggle("Decrescente", key=f"{name}_decrescente")
+    page_rows = col_tamanho.selectbox("Linhas por página", PAGE_SIZES, index=1, key=f"{name}_tamanho")
+    start_time = time.perf_counter()
+    positions = index.view(sort_col, not descending, term, columns)
+    pages = max(1, -(-len(positions) // page_rows))
+    if st.session_state.get(f"{name}_pagina", 1) > pages:
+        st.session_state[f"{name}_pagina"] = pages
+    page = st.number_input("Página", min_value=1, max_value=pages, key=f"{name}_pagina")
+    start = (page - 1) * page_rows
+    view_key = (key_parts, sort_col, descending, term, tuple(columns), page_rows)
+    windows = st.session_state.setdefault("grid_windows", {})
+    cached = windows.get(name)
+    prefetched = cached is not None and cached[0] == view_key and cached[1] <= start < cached[1] + cached[2].num_rows
+    if not prefetched:
+        windows[name] = (view_key, start, index.window(positions, start, start + page_rows * (1 + PREFETCH_PAGES), columns))
+    _, window_start, window = windows[name]
+    table = window.slice(start - window_start, page_rows)
+    latency = (time.perf_counter() - start_time) * 1000
+    st.dataframe(table, hide_index=True, use_container_width=True)
+    record_payload(f"tabela: {name}", table.nbytes, "tabela")
+    st.caption(f"Página {page} de {pages} · linhas {start + 1}–{start + table.num_rows} de {len(positions):,}".replace(",", ".")
+               + f" · página obtida em {latency:.1f} ms" + (" (pré-carregada)" if prefetched else ""))
+
+# Função para gerar sob demanda (com cache pelo estado dos filtros) e oferecer o download de uma exportação
+def export_download(label, ext, mime, writer, key_parts):
+    path = export_path(export_key(*key_parts, ext), ext)
+    if not os.path.exists(path) and st.button(f"Gerar {label}", key=f"gerar_{ext}"):
+        bar = st.progress(0.0, text=f"Gerando {label}...")
+        try:
+            with span(f"exportação: {label}"):
+                writer(path, lambda fraction: bar.progress(fraction, text=f"Gerando {label}..."))
+        except ImportError as e:
+            st.info(f"A exportação {label} requer a biblioteca '{e.name}' instalada no ambiente.")
+        bar.empty()
+    if os.path.exists(path):
+        record_payload(f"download: {label}", os.path.getsize(path), "arquivo")
+        with open(path, "rb") as f:
+            st.download_button(f"Baixar {label} dos dados filtrados", data=f, file_name=f"dados_filtrados.{ext}",
+                               mime=mime, key=f"baixar_{ext}")
+
+# Função para exibir um gráfico Plotly, registrando payload e tempo de renderização quando ativado
+# (na tabela da aba de gráficos e/ou na instrumentação do rerun)
+def plot_chart(name, fig, measure=False):
+    if not measure and current() is None:
+        st.plotly_chart(fig, use_container_width=True)
+        return
+    with span(f"gráfico: {name}"):
+        payload, serialize = figure_payload(fig)
+        start = time.perf_counter()
+        st.plotly_chart(fig, use_container_width=True)
+    record_payload(name, payload, "gráfico")
+    if not measure:
+        return
+    st.session_state.setdefault("chart_bench", {})[name] = {
+        "Gráfico": name,
+        "Payload (KB)": payload / 1024,
+        "Serialização (ms)": serialize * 1000,
+        "Renderização (ms)": (time.perf_counter() - start) * 1000,
+    }
+
+# Função para exibir a instrumentação do rerun no painel de depuração
+def show_profile(container, profile):
+    with container.container():
+        st.metric("Tempo do rerun (ms)", f"{profile.total * 1000:.0f}")
+        if profile.spans:
+            spans = pd.DataFrame(profile.spans).sort_values("inicio")
+            spans["Etapa"] = ["· " * nivel + nome for nivel, nome in zip(spans["nivel"], spans["span"])]
+            spans["ms"] = spans["segundos"] * 1000
+            st.markdown("**Etapas**")
+            st.dataframe(spans[["Etapa", "ms"]], hide_index=True)
+            abas = spans[spans["span"].str.startswith("aba: ")]
+            if not abas.empty:
+                dominante = abas.loc[abas["ms"].idxmax()]
+                st.caption(f"Aba mais lenta: {dominante['span'][5:]} ({dominante['ms']:.0f} ms)")
+        if profile.cache:
+            cache = pd.DataFrame(profile.cache)
+            resumo = cache.groupby("funcao").agg(
+                Chamadas=("resultado", "size"),
+                Acertos=("resultado", lambda r: int((r == "hit").sum())),
+                Falhas=("resultado", lambda r: int((r == "miss").sum())),
+                Sobrecarga_ms=("sobrecarga", lambda v: v.sum() * 1000),
+            ).reset_index().rename(columns={"funcao": "Função", "Sobrecarga_ms": "Hash/cópia (ms)"})
+            st.markdown("**Caches (st.cache_data)**")
+            st.dataframe(resumo, hide_index=True)
+        if profile.payloads:
+            payloads = pd.DataFrame(profile.payloads)
+            payloads["KB"] = payloads["bytes"] / 1024
+            st.markdown(f"**Enviado ao navegador: {payloads['KB'].sum():,.0f} KB**")
+            st.dataframe(payloads[["elemento", "tipo", "KB"]].rename(columns={"elemento": "Elemento", "tipo": "Tipo"}),
+                         hide_index=True)
+
+debug_panel = st.sidebar.expander("Depuração: desempenho do rerun")
+start_rerun(debug_panel.checkbox("Ativar instrumentação", value=default_enabled(), key="instrumentacao"))
+debug_output = debug_panel.empty()
+
+uploaded_file = st.file_uploader("Selecione uma planilha (Excel, CSV, TSV ou Parquet)...", type=SUPPORTED_TYPES)
+store = get_store()
+store_tables = store.tables()
+consolidated = not store_tables.empty and st.radio(
+    "Escopo da análise", ["Arquivo enviado", "Base consolidada"], horizontal=True, key="escopo"
+) == "Base consolidada"
+if uploaded_file is not None or consolidated:
+    if consolidated:
+        table_labels = {
+            row.tabela: f"{row.abas} abas · {int(row.linhas or 0):,} linhas".replace(",", ".")
+            for row in store_tables.itertuples()
+        }
+        table = st.selectbox("Tabela da base (abas com as mesmas colunas)", list(table_labels), format_func=table_labels.get)
+        fontes = store.sources(table)
+        fonte_labels = dict(zip(fontes["fonte"], fontes["arquivo"] + " · " + fontes["aba"]))
+        sources = tuple(st.multiselect("Abas incluídas na análise", list(fonte_labels), default=list(fonte_labels),
+                                       format_func=fonte_labels.get, key=f"fontes_{table}"))
+        if not sources:
+            st.warning("Selecione ao menos uma aba da base consolidada.")
+            st.stop()
+        store_version = store.version()
+        file_hash, sheet_selected = f"consolidada:{table}", (sources, store_version)
+        base_view = get_store_view(store, table, sources, (), store_version)
+        base_columns, base_num_cols = list(base_view.types), base_view.num_cols
+        with st.sidebar.expander("Base consolidada"):
+            fonte_removida = st.selectbox("Aba", list(fonte_labels), format_func=fonte_labels.get)
+            if st.button("Remover aba da base"):
+                store.remove(fonte_removida)
+                st.rerun()
+    else:
+        with span("registro do arquivo"):
+            file_hash, sheet_names = load_excel(uploaded_file)
+            if not workbook_cached(file_hash):
+                # Removida do cache em disco (limite de tamanho): registra o arquivo de novo
+                load_excel.clear()
+                file_hash, sheet_names = load_excel(uploaded_file)
+        sheet_selected = st.selectbox("Selecione a aba para análise", sheet_names)
+        ingest_bar = st.empty()
+
+        def ingest_progress(fraction):
+            ingest_bar.progress(min(fraction or 0.0, 1.0), text=f"Importando '{sheet_selected}'...")
+
+        with span("ingestão e pré-processamento"):
+            df, date_report = load_prepared(file_hash, sheet_selected, ingest_progress)
+        ingest_bar.empty()
+        if not date_report.empty:
+            with st.expander("Detecção de datas"):
+                st.dataframe(date_report, hide_index=True)
+        base_columns = df.columns.tolist()
+        base_num_cols = numeric_columns(df)
+        with st.sidebar.expander("Base consolidada"):
+            st.caption("Anexe as abas deste arquivo à base local para comparar safras e fazendas entre arquivos.")
+            if st.button("Adicionar arquivo à base"):
+                add_to_store(store, file_hash, uploaded_file.name, sheet_names)
+                st.rerun()
+    # Indicadores customizados (persistidos na sessão) entram como colunas numéricas da aba; os controles
+    # vêm antes da avaliação, para que um indicador com erro sempre possa ser removido
+    indicadores = st.session_state.setdefault("indicadores", {})
+    st.sidebar.subheader("Indicadores Customizados")
+    indicator_status = {}
+    for nome, expressao in list(indicadores.items()):
+        col_nome, col_remover = st.sidebar.columns([5, 1])
+        col_nome.markdown(f"**{nome}** = `{expressao}`")
+        indicator_status[nome] = col_nome.empty()
+        if col_remover.button("✖", key=f"remover_indicador_{nome}"):
+            del indicadores[nome]
+            st.rerun()
+    novo_nome = st.sidebar.text_input("Nome do indicador", value="Custom")
+    exp = st.sidebar.text_input("Digite expressão (ex: `[Área Operacional (ha)] / [Tempo Efetivo (h)]` ou `df['A']/df['B']`)")
+    if exp and st.sidebar.button("Adicionar indicador"):
+        try:
+            if not novo_nome.strip() or novo_nome in base_columns:
+                raise IndicatorError("Informe um nome que não seja o de uma coluna da aba.")
+            indicator = compile_indicator(exp, base_num_cols)
+            # Avaliação de teste sobre a aba (ou a seleção da base) antes de guardar na sessão
+            if consolidated:
+                base_view.check_expression(indicator.to_sql(quote))
+            else:
+                eval_indicator(df, file_hash, sheet_selected, exp)
+            indicadores[novo_nome.strip()] = exp
+            st.rerun()
+        except IndicatorError as e:
+            st.sidebar.error(f"Erro na expressão: {e}")
+    indicator_values = {}
+    for nome, expressao in indicadores.items():
+        try:
+            if nome in base_columns:
+                raise IndicatorError("Já existe uma coluna com esse nome na aba.")
+            if consolidated:
+                indicator_values[nome] = compile_indicator(expressao, base_num_cols).to_sql(quote)
+            else:
+                indicator_values[nome] = eval_indicator(df, file_hash, sheet_selected, expressao)
+        except IndicatorError as e:
+            indicator_status[nome].caption(f"⚠️ {e}")
+    indicator_key = tuple((nome, indicadores[nome]) for nome in indicator_values)
+
+    if consolidated:
+        # Na base consolidada os filtros são resolvidos por SQL (a visão expõe a mesma interface do motor)
+        engine = get_store_view(store, table, sources, tuple(indicator_values.items()), store_version) if indicator_values else base_view
+        cat_cols, num_cols, date_cols = engine.cat_cols, engine.num_cols, engine.date_cols
+    else:
+        if indicator_values:
+            df = df.assign(**indicator_values)
+        cat_cols, num_cols, date_cols = filter_columns(df)
+        engine = get_filter_engine(df, file_hash, sheet_selected, indicator_key)
 
     # Sidebar filtros
     st.sidebar.header("Filtros Dinâmicos")
     date_col, date_range = None, None
     if date_cols:
         date_col = st.sidebar.selectbox("Coluna de data para filtro", date_cols)
-        min_date, max_date = df[date_col].min().date(), df[date_col].max().date()
+        min_date, max_date = (d.date() for d in engine.bounds(date_col))
         date_range = st.sidebar.date_input(
             "Selecione o intervalo de datas",
             [min_date, max_date],
@@ -99,15 +347,18 @@ if uploaded_file is not None:
     for col in cat_cols:
         options = st.sidebar.multiselect(
             f"Filtrar {col}",
-            options=sorted(df[col].dropna().unique()),
-            default=sorted(df[col].dropna().unique()),
+            options=engine.values(col),
+            default=engine.values(col),
             key=f"catfilter_{col}"
         )
         cat_filters[col] = options
 
     num_filters = {}
     for col in num_cols:
-        min_val, max_val = float(df[col].min()), float(df[col].max())
+        min_val, max_val = (float(v) for v in engine.bounds(col))
+        # Coluna sem valores finitos (só nulos ou infinitos) não tem intervalo para o slider
+        if not (np.isfinite(min_val) and np.isfinite(max_val)):
+            continue
         step = max((max_val-min_val)/1000, 0.01)
         selected_range = st.sidebar.slider(
             f"Intervalo {col}",
@@ -119,47 +370,64 @@ if uploaded_file is not None:
         )
         num_filters[col] = selected_range
 
-    st.sidebar.subheader("Indicador Customizado")
-    exp = st.sidebar.text_input("Digite expressão (ex: `df['A']/df['B']`)")
-    if exp and st.sidebar.button("Adicionar indicador"):
-        try:
-            df["Custom"] = eval(exp)
-            if "Custom" not in num_cols:
-                num_cols.append("Custom")
-            st.success("Indicador adicionado!")
-        except Exception as e:
-            st.error(f"Erro na expressão: {e}")
+    with st.sidebar.expander("Desempenho dos gráficos"):
+        point_budget = st.number_input("Máximo de pontos por gráfico", min_value=500, value=POINT_BUDGET, step=500)
+        measure_charts = st.checkbox("Medir payload e renderização dos gráficos")
+
+    if consolidated:
+        with span("filtros"):
+            filter_key = (indicator_key, engine.predicates(cat_filters, num_filters, date_col, date_range))
+            df_filtered, total_filtered = get_store_sample(engine, table, sources, store_version, filter_key)
+        df = df_filtered
+        if total_filtered > len(df_filtered):
+            st.caption(f"Base consolidada: {total_filtered:,} linhas filtradas. KPIs e agregações usam todas; "
+                       f"tabelas, mapa e gráficos por linha usam uma amostra de {len(df_filtered):,}.".replace(",", "."))
+    else:
+        with span("filtros"):
+            df_filtered, filter_key = apply_filters(engine, df, cat_filters, num_filters, date_col, date_range, indicator_key)
 
-    df_filtered = apply_filters(df, cat_filters, num_filters, date_col, date_range)
+    op_col = find_column(df.columns, "operador")
+    area_col = find_column(df.columns, "área operacional")
+    ef_col = find_column(df.columns, "eficiência de motor")
+    consumo_col = find_column(df.columns, "consumo médio")
+    rend_col = find_column(df.columns, "rendimento operacional")
+    cube_metrics = cube_metric_columns(df.columns, num_cols, list(indicator_values))
+    with span("cubo de agregação"):
+        if consolidated:
+            cube = get_store_cube(engine, table, sources, store_version, filter_key, tuple(cube_keys(df.columns)), tuple(cube_metrics), date_col)
+        else:
+            cube = get_cube(df_filtered, file_hash, sheet_selected, filter_key, tuple(cube_keys(df.columns)), tuple(cube_metrics), date_col)
 
     tab_kpi, tab_charts, tab_data, tab_manut, tab_geo, tab_sim, tab_rel = st.tabs([
         "🌟 KPIs", "📈 Gráficos", "📑 Dados", "🛠️ Manutenção", "🗺️ Mapa", "🧮 Simulador", "📤 Exportar"
     ])
 
     # KPIs cards
-    with tab_kpi:
+    with tab_kpi, span("aba: KPIs"):
         st.markdown("## Principais Indicadores")
         kpis = [
-            {"titulo": "Eficiência de Motor (%)", "valor": df_filtered.get("Eficiência de Motor (%)", pd.Series()).mean() if "Eficiência de Motor (%)" in df_filtered else None, "cor": "#0074D9", "icone": "⚡", "meta": 65},
-            {"titulo": "Área Operacional (ha)", "valor": df_filtered.get("Área Operacional (ha)", pd.Series()).sum() if "Área Operacional (ha)" in df_filtered else None, "cor": "#2ECC40", "icone": "🌱", "meta": None},
-            {"titulo": "Consumo Médio (l/ha)", "valor": df_filtered.get("Consumo Médio (l/ha)", pd.Series()).mean() if "Consumo Médio (l/ha)" in df_filtered else None, "cor": "#B10DC9", "icone": "🛢️", "meta": None},
-            {"titulo": "Rendimento Operacional (ha/h)", "valor": df_filtered.get("Rendimento Operacional (ha/h)", pd.Series()).mean() if "Rendimento Operacional (ha/h)" in df_filtered else None, "cor": "#FF851B", "icone": "🚜", "meta": None},
-            {"titulo": "Velocidade Média Efetiva (km/h)", "valor": df_filtered.get("Velocidade Média Efetiva (km/h)", pd.Series()).mean() if "Velocidade Média Efetiva (km/h)" in df_filtered else None, "cor": "#39CCCC", "icone": "🏁", "meta": None},
-            {"titulo": "Tempo Efetivo Médio (h)", "valor": df_filtered.get("Tempo Efetivo (h)", pd.Series()).mean() if "Tempo Efetivo (h)" in df_filtered else None, "cor": "#FFDC00", "icone": "⏱️", "meta": None},
-            {"titulo": "Média de RPM em Efetivo", "valor": df_filtered.get("RPM Médio em Efetivo", pd.Series()).mean() if "RPM Médio em Efetivo" in df_filtered else None, "cor": "#85144b", "icone": "🔄", "meta": None},
-            {"titulo": "Número de Operadores", "valor": df_filtered["Operador"].nunique() if "Operador" in df_filtered else None, "cor": "#7FDBFF", "icone": "👤", "meta": None},
-            {"titulo": "Equipamentos Utilizados", "valor": df_filtered["Equipamento"].nunique() if "Equipamento" in df_filtered else None, "cor": "#3D9970", "icone": "🧰", "meta": None},
+            {"titulo": "Eficiência de Motor (%)", "valor": kpi_value(cube, "Eficiência de Motor (%)", "mean"), "cor": "#0074D9", "icone": "⚡", "meta": 65},
+            {"titulo": "Área Operacional (ha)", "valor": kpi_value(cube, "Área Operacional (ha)", "sum"), "cor": "#2ECC40", "icone": "🌱", "meta": None},
+            {"titulo": "Consumo Médio (l/ha)", "valor": kpi_value(cube, "Consumo Médio (l/ha)", "mean"), "cor": "#B10DC9", "icone": "🛢️", "meta": None},
+            {"titulo": "Rendimento Operacional (ha/h)", "valor": kpi_value(cube, "Rendimento Operacional (ha/h)", "mean"), "cor": "#FF851B", "icone": "🚜", "meta": None},
+            {"titulo": "Velocidade Média Efetiva (km/h)", "valor": kpi_value(cube, "Velocidade Média Efetiva (km/h)", "mean"), "cor": "#39CCCC", "icone": "🏁", "meta": None},
+            {"titulo": "Tempo Efetivo Médio (h)", "valor": kpi_value(cube, "Tempo Efetivo (h)", "mean"), "cor": "#FFDC00", "icone": "⏱️", "meta": None},
+            {"titulo": "Média de RPM em Efetivo", "valor": kpi_value(cube, "RPM Médio em Efetivo", "mean"), "cor": "#85144b", "icone": "🔄", "meta": None},
+            {"titulo": "Número de Operadores", "valor": kpi_value(cube, "Operador", "nunique"), "cor": "#7FDBFF", "icone": "👤", "meta": None},
+            {"titulo": "Equipamentos Utilizados", "valor": kpi_value(cube, "Equipamento", "nunique"), "cor": "#3D9970", "icone": "🧰", "meta": None},
         ]
         kpi_options = {
-            "Número de Talhões": ("Talhão", lambda d: d["Talhão"].nunique() if "Talhão" in d else None),
-            "Consumo Médio Efetivo (l/h)": ("Consumo Médio Efetivo (l/h)", lambda d: d["Consumo Médio Efetivo (l/h)"].mean() if "Consumo Médio Efetivo (l/h)" in d else None),
-            "Velocidade Média (km/h)": ("Velocidade Média Efetiva (km/h)", lambda d: d["Velocidade Média Efetiva (km/h)"].mean() if "Velocidade Média Efetiva (km/h)" in d else None),
-            "RPM Médio": ("RPM Médio em Efetivo", lambda d: d["RPM Médio em Efetivo"].mean() if "RPM Médio em Efetivo" in d else None)
+            "Número de Talhões": ("Talhão", "nunique"),
+            "Consumo Médio Efetivo (l/h)": ("Consumo Médio Efetivo (l/h)", "mean"),
+            "Velocidade Média (km/h)": ("Velocidade Média Efetiva (km/h)", "mean"),
+            "RPM Médio": ("RPM Médio em Efetivo", "mean")
         }
+        for nome in indicator_values:
+            kpi_options[f"Indicador: {nome}"] = (nome, "mean")
         selected_extra_kpis = st.multiselect("Selecione KPIs adicionais para exibir",options=list(kpi_options.keys()))
         for kpi_name in selected_extra_kpis:
-            title, func = kpi_options[kpi_name]
-            val = func(df_filtered)
+            column, stat = kpi_options[kpi_name]
+            val = kpi_value(cube, column, stat)
             kpis.append({"titulo": kpi_name,"valor": val,"cor": "#FF69B4","icone": "📊","meta": None})
         cols = st.columns(min(len(kpis), 4), gap="large")
         for i, kpi in enumerate(kpis):
@@ -186,116 +454,156 @@ if uploaded_file is not None:
                     """, unsafe_allow_html=True)
 
     # Aba Gráficos
-    with tab_charts:
+    with tab_charts, span("aba: Gráficos"):
         st.markdown("## Análises Interativas e Drill-Down")
-        op_col = next((col for col in df_filtered.columns if "operador" in col.lower()), None)
-        area_col = next((col for col in df_filtered.columns if "área operacional" in col.lower()), None)
         if op_col and area_col:
-            base_bar_df = df_filtered.groupby(op_col)[area_col].sum().reset_index()
+            base_bar_df = metric_stat(cube, area_col, "sum", by=op_col).rename(area_col).reset_index()
             fig = px.bar(base_bar_df, x=op_col, y=area_col, text_auto=True, title="Área Operacional por Operador")
-            st.plotly_chart(fig, use_container_width=True)
+            plot_chart("Área por operador", fig, measure_charts)
             operadores = base_bar_df[op_col].tolist()
             operador_select = st.selectbox("Clique em um operador para detalhar:", operadores)
-            detalhados = df_filtered[df_filtered[op_col] == operador_select]
+            op_rows = get_row_groups(df_filtered, file_hash, sheet_selected, filter_key, op_col)
+            detalhados = df_filtered.iloc[op_rows.get(operador_select, [])]
+            op_cube = slice_cube(cube, op_col, operador_select)
             st.markdown(f"### Detalhes do operador: {operador_select}")
             with st.expander("Tabela de Operações"):
-                st.dataframe(detalhados.reset_index(drop=True))
+                paged_table("detalhados", detalhados, (file_hash, sheet_selected, filter_key, operador_select))
             st.markdown("#### KPIs do Operador Selecionado")
-            kpi_ef = detalhados["Eficiência de Motor (%)"].mean() if "Eficiência de Motor (%)" in detalhados else None
-            kpi_ar = detalhados["Área Operacional (ha)"].sum() if "Área Operacional (ha)" in detalhados else None
-            kpi_vel = detalhados["Velocidade Média Efetiva (km/h)"].mean() if "Velocidade Média Efetiva (km/h)" in detalhados else None
+            kpi_ef = kpi_value(op_cube, "Eficiência de Motor (%)", "mean")
+            kpi_ar = kpi_value(op_cube, "Área Operacional (ha)", "sum")
+            kpi_vel = kpi_value(op_cube, "Velocidade Média Efetiva (km/h)", "mean")
             st.metric("Eficiência de Motor (%)", f"{kpi_ef:.2f}" if kpi_ef is not None else "N/A")
             st.metric("Área Operacional (ha)", f"{kpi_ar:.2f}" if kpi_ar is not None else "N/A")
             st.metric("Velocidade Média Efetiva (km/h)", f"{kpi_vel:.2f}" if kpi_vel is not None else "N/A")
-        ef_col = next((col for col in df_filtered.columns if "eficiência de motor" in col.lower()), None)
-        consumo_col = next((col for col in df_filtered.columns if "consumo médio" in col.lower()), None)
-        rend_col = next((col for col in df_filtered.columns if "rendimento operacional" in col.lower()), None)
         if ef_col and op_col:
-            ef_bar = df_filtered.groupby(op_col)[ef_col].mean().reset_index().sort_values(by=ef_col, ascending=False)
+            ef_bar = metric_stat(cube, ef_col, "mean", by=op_col).rename(ef_col).reset_index().sort_values(by=ef_col, ascending=False)
             fig2 = px.bar(ef_bar, x=op_col, y=ef_col, color=ef_col, color_continuous_scale="Viridis", text_auto=".2f")
-            st.plotly_chart(fig2, use_container_width=True)
+            plot_chart("Eficiência por operador", fig2, measure_charts)
         if consumo_col and op_col:
-            fig3 = px.box(df_filtered, x=op_col, y=consumo_col, points="all")
-            st.plotly_chart(fig3, use_container_width=True)
+            fig3, elided = grouped_box_figure(df_filtered, op_col, consumo_col, point_budget)
+            plot_chart("Consumo por operador", fig3, measure_charts)
+            if elided:
+                st.caption(f"{elided:,} outliers menos extremos omitidos no gráfico (limite de {point_budget:,} pontos).")
         if rend_col and op_col:
-            rend_scatter = df_filtered.groupby(op_col)[rend_col].mean().reset_index()
+            rend_scatter = metric_stat(cube, rend_col, "mean", by=op_col).rename(rend_col).reset_index()
             fig4 = px.scatter(rend_scatter, x=op_col, y=rend_col, size=rend_col, color=rend_col, color_continuous_scale=px.colors.sequential.Plasma)
-            st.plotly_chart(fig4, use_container_width=True)
+            plot_chart("Rendimento por operador", fig4, measure_charts)
         if num_cols:
             numeric_to_plot = st.selectbox("Selecione coluna para Histograma e Boxplot", num_cols, index=0)
-            fig_hist = px.histogram(df_filtered, x=numeric_to_plot, marginal="box", nbins=25, title=f"Distribuição de {numeric_to_plot}")
-            st.plotly_chart(fig_hist, use_container_width=True)
+            fig_hist = histogram_figure(df_filtered[numeric_to_plot], numeric_to_plot, nbins=25)
+            plot_chart("Histograma", fig_hist, measure_charts)
+            if date_col:
+                fig_ts, elided = timeseries_figure(df_filtered[date_col], df_filtered[numeric_to_plot], numeric_to_plot, point_budget)
+                plot_chart("Série temporal", fig_ts, measure_charts)
+                if elided:
+                    st.caption(f"{elided:,} pontos omitidos na série (LTTB, limite de {point_budget:,} pontos).")
+        if measure_charts and st.session_state.get("chart_bench"):
+            with st.expander("Payload e tempo por gráfico"):
+                st.dataframe(pd.DataFrame(st.session_state["chart_bench"].values()), hide_index=True)
 
     # Aba Dados
-    with tab_data:
+    with tab_data, span("aba: Dados"):
         st.markdown("## Dados filtrados")
-        st.dataframe(df_filtered.reset_index(drop=True))
+        paged_table("dados", df_filtered, (file_hash, sheet_selected, filter_key))
 
     # Aba Manutenção
-    with tab_manut:
+    with tab_manut, span("aba: Manutenção"):
         st.markdown("## Análise e alertas de Manutenção")
-        manut_cols = [col for col in df_filtered.columns if 'manut' in col.lower()]
-        horimetro_cols = [col for col in df_filtered.columns if 'horimet' in col.lower()]
+        manut_cols = [col for col in df_filtered.columns if STATUS_HINT in col.lower()]
+        horimetro_cols = [col for col in df_filtered.columns if HOURMETER_HINT in col.lower()]
         if manut_cols and horimetro_cols:
-            hor_col = horimetro_cols[0]
-            manut_col = manut_cols[0]
-            limite_hor = st.number_input("Horímetro mínimo para alerta", min_value=0, value=1000)
-            status_alerta = st.multiselect("Status de manutenção para alerta", ['sim', 'pendente', 'agendar'], default=['pendente', 'agendar'])
-            alerta_df = df_filtered[
-                (df_filtered[hor_col] >= limite_hor) &
-                (df_filtered[manut_col].fillna('').astype(str).str.lower().isin([s.lower() for s in status_alerta]))
-            ]
+            col_hor, col_manut = st.columns(2)
+            hor_col = col_hor.selectbox("Coluna de horímetro", horimetro_cols)
+            manut_col = col_manut.selectbox("Coluna de status de manutenção", manut_cols)
+            equip_col = find_column(df.columns, "equipamento")
+            # Na base consolidada, status e métricas vêm de todas as linhas filtradas, não da amostra
+            if consolidated:
+                manut_status = get_store_status_counts(engine, table, sources, store_version, filter_key, manut_col)
+            else:
+                manut_status = normalize_status(df_filtered[manut_col]).value_counts().sort_index()
+            status_options = manut_status.index.tolist()
+            with st.expander("Regras de alerta", expanded=True):
+                col_r1, col_r2, col_r3 = st.columns(3)
+                limite_hor = col_r1.number_input("Horímetro mínimo para alerta (0 = desativada)", min_value=0, value=1000)
+                intervalo = col_r2.number_input("Horas desde a última manutenção (0 = desativada)", min_value=0, value=0)
+                combinacao = col_r3.radio("Disparar alerta quando", ["todas", "qualquer"], horizontal=True,
+                                          format_func={"todas": "Todas as regras", "qualquer": "Qualquer regra"}.get)
+                status_alerta = st.multiselect("Status de manutenção para alerta", status_options,
+                                               default=[s for s in ALERT_STATUSES if s in status_options])
+                status_servico = st.multiselect("Status que indicam manutenção realizada", status_options,
+                                                default=[s for s in SERVICE_STATUSES if s in status_options])
+            rules = []
+            if limite_hor:
+                rules.append(("horimetro", float(limite_hor)))
+            if intervalo:
+                rules.append(("intervalo", float(intervalo)))
+            if status_alerta:
+                rules.append(("status", tuple(status_alerta)))
+            if consolidated:
+                equipamentos = get_store_equipment(engine, table, sources, store_version, filter_key, hor_col, manut_col,
+                                                   equip_col, date_col, tuple(status_servico))
+                alerta_df, equipamentos_df = apply_rules(equipamentos, rules, combinacao)
+                st.caption(f"{len(equipamentos_df)} equipamentos avaliados sobre todas as {total_filtered:,} linhas filtradas da base."
+                           .replace(",", "."))
+            else:
+                rules_engine = get_rules_engine(file_hash, sheet_selected, hor_col, manut_col, equip_col, date_col)
+                alerta_df, equipamentos_df = rules_engine.evaluate(df_filtered, rules, status_servico, combinacao)
+                st.caption(f"{len(equipamentos_df)} equipamentos avaliados; {equipamentos_df.attrs[RECOMPUTED]} recalculados nesta execução.")
             if not alerta_df.empty:
-                st.warning(f"{len(alerta_df)} alertas de manutenção detectados!")
-                st.dataframe(alerta_df.reset_index(drop=True))
+                st.warning(f"{len(alerta_df)} equipamentos com alerta de manutenção!")
+                paged_table("alertas", alerta_df, (file_hash, sheet_selected, filter_key, hor_col, manut_col,
+                                                          date_col, equip_col,
+                                                          tuple(rules), tuple(status_servico), combinacao))
             else:
                 st.success("Nenhum alerta de manutenção pendente encontrado.")
-            manut_status = df_filtered[manut_col].value_counts().reset_index()
+            manut_status = manut_status[manut_status > 0]
             if not manut_status.empty:
-                fig_pie = px.pie(manut_status, names='index', values=manut_col,
+                fig_pie = px.pie(names=manut_status.index.astype(str), values=manut_status.to_numpy(),
                                  title="Distribuição Status de Manutenção", color_discrete_sequence=px.colors.qualitative.Pastel)
                 st.plotly_chart(fig_pie, use_container_width=True)
         else:
             st.info("Colunas para alertas de manutenção ou horímetro não encontradas.")
 
     # Aba Mapa
-    with tab_geo:
+    with tab_geo, span("aba: Mapa"):
         st.markdown("## Mapa Interativo")
         lat_candidates = [col for col in df.columns if 'lat' in col.lower()]
         lon_candidates = [col for col in df.columns if 'lon' in col.lower() or 'long' in col.lower()]
         if lat_candidates and lon_candidates:
             lat_col = lat_candidates[0]
             lon_col = lon_candidates[0]
-            map_data = df_filtered[[lat_col, lon_col]].dropna()
-            if not map_data.empty:
-                m = folium.Map(location=[map_data[lat_col].mean(), map_data[lon_col].mean()], zoom_start=12, tiles='OpenStreetMap')
-                for _, row in map_data.iterrows():
-                    folium.CircleMarker(
-                        location=[row[lat_col], row[lon_col]],
-                        radius=6,
-                        color='#007AFF',
-                        fill=True,
-                        fill_opacity=0.8
-                    ).add_to(m)
-                st_folium(m, width=950, height=400)
+            geo_index = get_geo_index(df_filtered, file_hash, sheet_selected, filter_key, lat_col, lon_col)
+            if len(geo_index):
+                map_mode = st.radio("Visualização", ["Grade agregada", "Mapa de calor"], horizontal=True)
+                map_budget = st.number_input("Máximo de pontos no mapa", min_value=100, value=MAP_POINT_BUDGET, step=100)
+                view_bounds, view_zoom = parse_view(st.session_state.get("mapa"))
+                layer, info = build_layer(geo_index, view_bounds, view_zoom,
+                                          "calor" if map_mode == "Mapa de calor" else "grade", map_budget)
+                st_folium(base_map(geo_index), width=950, height=400, key="mapa",
+                          feature_group_to_add=layer, returned_objects=["bounds", "zoom"])
+                if current() is not None:
+                    # Tamanho aproximado do mapa enviado (base mais camada), medido só com a instrumentação ativa
+                    preview = base_map(geo_index)
+                    layer.add_to(preview)
+                    record_payload("mapa", len(preview.get_root().render()), "mapa")
+                if info["celulas"]:
+                    st.caption(f"{info['visiveis']:,} pontos na área visível, agregados em {info['celulas']:,} células.")
+                else:
+                    st.caption(f"{info['visiveis']:,} pontos na área visível.")
             else:
                 st.info("Não há dados geográficos disponíveis após filtro.")
         else:
             st.info("Colunas de latitude e longitude não encontradas no dataset.")
 
     # Aba Simulador
-    with tab_sim:
+    with tab_sim, span("aba: Simulador"):
         st.markdown("## Simulador e Cenários 'E se?'")
         st.info("Os parâmetros reais abaixo foram extraídos dos dados filtrados. Ajuste os sliders para avaliar cenários.")
 
+        # Estatísticas reais lidas do cubo (calculado uma vez por estado dos filtros)
         def get_real(param_col, agg='mean'):
-            if param_col in df_filtered:
-                if agg == 'mean':
-                    return float(df_filtered[param_col].mean())
-                elif agg == 'min':
-                    return float(df_filtered[param_col].min())
-                elif agg == 'max':
-                    return float(df_filtered[param_col].max())
+            if has_metric(cube, param_col):
+                return metric_stat(cube, param_col, agg)
             return None
 
         velocidade_real = get_real("Velocidade Média Efetiva (km/h)")
@@ -332,7 +640,7 @@ if uploaded_file is not None:
         area_op_sim = st.slider(
             "Área Operacional Simulada (ha)",
             min_value=float(area_min or 100),
-            max_value=float(area_max or 5000),
+            max_value=float(max(area_max or 5000, area_real or 0)),
             value=float(area_real or 1000),
             step=10.0
         )
@@ -381,34 +689,71 @@ if uploaded_file is not None:
             elif potencial_economia < 0:
                 st.warning(f"Simulação indica aumento de consumo em {abs(potencial_economia):.2f} litros.")
 
+        st.markdown("### Cenários Monte Carlo")
+        sim_keys = [key for key in (op_col, find_column(df.columns, "equipamento")) if key]
+        sim_group = st.radio("Ajustar distribuições por", sim_keys + ["Todos os dados"], horizontal=True)
+        sim_start = time.perf_counter()
+        sim_fit = fit_distributions(cube, sim_group if sim_group in sim_keys else None)
+        sim_draws = draw(sim_fit, N_DRAWS)
+        sim_targets = {
+            name: valor for name, valor in (
+                ("velocidade", velocidade_sim), ("eficiencia", eficiencia_sim),
+                ("consumo", consumo_sim), ("area", area_op_sim),
+            ) if name in sim_draws
+        }
+        sim_summary = simulate(sim_fit, sim_draws, sim_targets) if sim_draws else pd.DataFrame()
+        if sim_summary.empty:
+            st.info("Dados insuficientes para a simulação (consumo e área, ou velocidade, eficiência e rendimento).")
+        else:
+            st.caption(f"{N_DRAWS:,} sorteios por cenário, distribuições ajustadas em {len(sim_fit['groups'])} grupo(s).")
+            st.dataframe(sim_summary, hide_index=True)
+            sim_outputs = [key for key in OUTPUTS if OUTPUTS[key] in sim_summary["Saída"].tolist()]
+            sim_output = st.selectbox("Saída para sensibilidade e grade", sim_outputs, format_func=OUTPUTS.get)
+            sens = tornado(sim_fit, sim_draws, sim_targets, sim_output)
+            fig_tornado = px.bar(sens, y="Parâmetro", x=["-10%", "+10%"], barmode="overlay", orientation="h",
+                                 title=f"Sensibilidade (±10%): variação de {OUTPUTS[sim_output]} em torno de {sens.attrs['centro']:.2f}")
+            plot_chart("Tornado", fig_tornado, measure_charts)
+            grid_x, grid_y = GRID_AXES[sim_output]
+            if grid_x in sim_targets and grid_y in sim_targets:
+                x_values = np.linspace(0.8, 1.2, 9) * sim_targets[grid_x]
+                y_values = np.linspace(0.8, 1.2, 9) * sim_targets[grid_y]
+                grid = scenario_grid(sim_fit, sim_draws, sim_targets, grid_x, x_values, grid_y, y_values, sim_output)
+                fig_grid = px.imshow(grid, x=np.round(x_values, 2), y=np.round(y_values, 2), aspect="auto", origin="lower",
+                                     labels={"x": SIM_METRICS[grid_x], "y": SIM_METRICS[grid_y], "color": OUTPUTS[sim_output]},
+                                     title=f"Grade de cenários (média): {OUTPUTS[sim_output]}")
+                plot_chart("Grade de cenários", fig_grid, measure_charts)
+            st.caption(f"Simulação concluída em {(time.perf_counter() - sim_start) * 1000:.0f} ms.")
+
     # Aba Exportar
-    with tab_rel:
+    with tab_rel, span("aba: Exportar"):
         st.markdown("## Exportar/Compartilhar")
-        st.download_button(
-            "Baixar CSV dos dados filtrados",
-            data=df_filtered.to_csv(index=False).encode('utf-8'),
-            file_name="dados_filtrados.csv",
-            mime="text/csv"
-        )
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            df_filtered.to_excel(writer)
-        st.download_button(
-            "Baixar Excel dos dados filtrados",
-            data=excel_buffer.getvalue(),
-            file_name="dados_filtrados.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        try:
-            pdf_data = export_pdf(df_filtered).getvalue()
-            st.download_button(
-                "Baixar PDF dos dados filtrados",
-                data=pdf_data,
-                file_name="dados_filtrados.pdf",
-                mime="application/pdf"
-            )
-        except Exception:
-            st.info("PDF export requer a biblioteca 'reportlab' instalada no ambiente.")
+        st.caption("Os arquivos são gerados apenas quando solicitados e reaproveitados enquanto os filtros não mudam.")
+        export_parts = (file_hash, sheet_selected, filter_key, list(df_filtered.columns))
+
+        # CSV e Parquet da base consolidada saem em lotes direto da consulta (todas as linhas filtradas)
+        def filtered_rows():
+            return engine.blocks(filter_key[1]) if consolidated else df_filtered
+
+        if consolidated:
+            st.caption("Na base consolidada, Excel e PDF usam a amostra exibida; CSV e Parquet trazem todas as linhas filtradas.")
+        export_download("CSV", "csv", "text/csv", lambda path, progress: export_csv(filtered_rows(), path, progress), export_parts)
+        export_download("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        lambda path, progress: export_excel(df_filtered, path, progress), export_parts)
+        export_download("Parquet", "parquet", "application/vnd.apache.parquet",
+                        lambda path, progress: export_parquet(filtered_rows(), path, progress, engine.arrow_schema() if consolidated else None), export_parts)
+        pdf_charts = []
+        if op_col and area_col:
+            pdf_charts.append(("Área Operacional por Operador", metric_stat(cube, area_col, "sum", by=op_col)))
+        if op_col and ef_col:
+            pdf_charts.append(("Eficiência de Motor por Operador", metric_stat(cube, ef_col, "mean", by=op_col)))
+        export_download("PDF", "pdf", "application/pdf",
+                        lambda path, progress: export_pdf(df_filtered, path, kpis=[(k["titulo"], k["valor"]) for k in kpis],
+                                                          charts=pdf_charts, progress=progress),
+                        export_parts + ([k["titulo"] for k in kpis],))
 
 else:
-    st.info("Faça o upload de uma planilha Excel para análise.")
+    st.info("Faça o upload de uma planilha (Excel, CSV, TSV ou Parquet) ou escolha a base consolidada para análise.")
+
+rerun_profile = finish_rerun()
+if rerun_profile is not None:
+    show_profile(debug_output, rerun_profile)
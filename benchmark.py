@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Benchmark sem interface do pipeline do app.py sobre planilhas sintéticas: tempo e memória de cada
+# etapa, em JSON, com comparação contra uma linha de base gravada. A memória tem duas medidas: o pico
+# do heap Python (tracemalloc, que não vê Arrow nem DuckDB) e o pico do RSS do processo na etapa.
+# Exemplo: python benchmark.py --sizes 10k 100k --formats xlsx parquet --baseline benchmark_baseline.json
+# O cache em disco fica num diretório temporário próprio, definido antes de importar o pipeline
+_OWN_CACHE = "ANALYZER_CACHE_DIR" not in os.environ
+os.environ.setdefault("ANALYZER_CACHE_DIR", tempfile.mkdtemp(prefix="analyzer-bench-"))
+
+import numpy as np
+import pandas as pd
+
+from aggregates import KPI_METRICS, build_cube, cube_keys, cube_metric_columns, find_column, kpi_value, metric_stat
+from charts import POINT_BUDGET, figure_payload, grouped_box_figure, histogram_figure, timeseries_figure
+from exports import export_csv, export_excel, export_key, export_parquet, export_path, export_pdf
+from filters import FilterEngine, filter_columns, filter_rows
+from geo import POINT_BUDGET as MAP_POINT_BUDGET, GeoIndex, base_map, build_layer
+from grid import GridIndex
+from maintenance import ALERT_STATUSES, SERVICE_STATUSES, RulesEngine
+from datetimes import detect_datetimes
+from sheet_cache import CACHE_DIR, load_sheet, register_workbook, wait_for_conversion
+from synthetic import SIZES, XLSX_MAX_ROWS, parse_size, write_synthetic
+
+FORMATS = ("xlsx", "csv", "parquet")
+EXPORTS = ("csv", "xlsx", "parquet", "pdf")
+BASELINE_PATH = "benchmark_baseline.json"
+TOLERANCE = 0.20
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 5.0
+RSS_INTERVAL = 0.01
+
+# Cards de KPI exibidos na aba principal: (coluna, estatística)
+KPI_CARDS = [(col, "sum" if col == "Área Operacional (ha)" else "mean") for col in KPI_METRICS] + [
+    ("Operador", "nunique"), ("Equipamento", "nunique"), ("Talhão", "nunique"),
+]
+
+
+# Memória residente atual do processo (Linux); None onde /proc não existe
+def _current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Pico do RSS durante a etapa, amostrado numa thread; inclui buffers do Arrow e do DuckDB
+class RssPeak:
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.start = self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss() or 0)
+
+    def __enter__(self):
+        self.start = self.peak = _current_rss()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, _current_rss() or 0)
+        return False
+
+
+class Recorder:
+    def __init__(self, rows, kind, memory=True):
+        self.rows = rows
+        self.kind = kind
+        self.memory = memory
+        self.results = []
+
+    def stage(self, name, func, *args, **kwargs):
+        if self.memory:
+            tracemalloc.start()
+        rss = RssPeak()
+        start = time.perf_counter()
+        try:
+            with rss:
+                value = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+            if self.memory:
+                tracemalloc.stop()
+        result = {"rows": self.rows, "format": self.kind, "stage": name, "seconds": seconds,
+                  "python_heap_peak_mb": peak / 2 ** 20 if peak is not None else None,
+                  "rss_peak_mb": rss.peak / 2 ** 20 if rss.peak is not None else None,
+                  "rss_growth_mb": (rss.peak - rss.start) / 2 ** 20 if rss.start is not None else None}
+        self.results.append(result)
+        line = f"  {name:<28} {seconds:9.3f} s"
+        if peak is not None:
+            line += f" {result['python_heap_peak_mb']:10.1f} MB heap"
+        if rss.start is not None:
+            line += f" {result['rss_growth_mb']:+10.1f} MB RSS"
+        print(line, file=sys.stderr)
+        return value, result
+
+
+# Registro do arquivo (load_excel do app) com a conversão para Parquet concluída dentro da etapa,
+# para que a ingestão não se sobreponha às etapas seguintes
+def _ingest(path, name):
+    with open(path, "rb") as f:
+        file_hash, sheets = register_workbook(f.read(), name)
+    wait_for_conversion(file_hash)
+    return file_hash, sheets
+
+
+# Valores e limites que a barra lateral consulta a cada rerun para montar os filtros
+def _filter_widgets(engine, cat_cols, num_cols, date_cols):
+    for col in cat_cols:
+        engine.values(col)
+    for col in num_cols + date_cols:
+        engine.bounds(col)
+
+
+# Filtros típicos: metade dos operadores, faixa central de eficiência e o meio do período
+def _filters(engine, df, date_col):
+    operators = engine.values("Operador")
+    low, high = (float(v) for v in engine.bounds("Eficiência de Motor (%)"))
+    cat_filters = {"Operador": operators[: max(1, len(operators) // 2)]}
+    num_filters = {"Eficiência de Motor (%)": (low + (high - low) * 0.1, high - (high - low) * 0.1)}
+    date_range = None
+    if date_col:
+        first, last = engine.bounds(date_col)
+        date_range = (first + (last - first) * 0.25, first + (last - first) * 0.75)
+    return cat_filters, num_filters, date_range
+
+
+def _kpis(df, num_cols, date_col):
+    cube = build_cube(df, cube_keys(df.columns), cube_metric_columns(df.columns, num_cols), date_col)
+    return cube, [kpi_value(cube, col, stat) for col, stat in KPI_CARDS]
+
+
+def _charts(df, cube, date_col, budget=POINT_BUDGET):
+    import plotly.express as px
+    op_col = find_column(df.columns, "operador")
+    area = metric_stat(cube, "Área Operacional (ha)", "sum", by=op_col).rename("Área Operacional (ha)").reset_index()
+    figures = {
+        "area_por_operador": px.bar(area, x=op_col, y="Área Operacional (ha)", text_auto=True),
+        "consumo_box": grouped_box_figure(df, op_col, "Consumo Médio (l/ha)", budget)[0],
+        "histograma": histogram_figure(df["Eficiência de Motor (%)"], "Eficiência de Motor (%)"),
+    }
+    if date_col:
+        figures["serie_temporal"] = timeseries_figure(df[date_col], df["Eficiência de Motor (%)"],
+                                                      "Eficiência de Motor (%)", budget)[0]
+    return {name: figure_payload(fig)[0] for name, fig in figures.items()}
+
+
+def _map(df):
+    index = GeoIndex(df["Latitude"].to_numpy(dtype="float64"), df["Longitude"].to_numpy(dtype="float64"))
+    layer, info = build_layer(index, None, None, "grade", MAP_POINT_BUDGET)
+    fmap = base_map(index)
+    layer.add_to(fmap)
+    return len(fmap.get_root().render()), info
+
+
+def _maintenance(df, date_col):
+    engine = RulesEngine("Horimetro (h)", "Status Manutenção", "Equipamento", date_col)
+    rules = [("horimetro", 1000.0), ("status", ALERT_STATUSES)]
+    engine.evaluate(df, rules, SERVICE_STATUSES, "todas")
+    return engine
+
+
+def _grid(df):
+    index = GridIndex(df)
+    positions = index.view("Eficiência de Motor (%)", False, "operador 1", ("Operador",))
+    return index.window(positions, 0, 300, index.columns)
+
+
+def run_case(rows, kind, workdir, exports=EXPORTS, memory=True, seed=0):
+    rec = Recorder(rows, kind, memory)
+    path = os.path.join(workdir, f"sintetico_{rows}.{kind}")
+    if not os.path.exists(path):
+        write_synthetic(path, rows, seed)
+    rec.results.append({"rows": rows, "format": kind, "stage": "arquivo_mb", "seconds": None,
+                        "python_heap_peak_mb": None, "size_mb": os.path.getsize(path) / 2 ** 20})
+    # load_sheet + preprocess_df compõem o load_prepared do app (sheet_cache.prepare_sheet)
+    (file_hash, sheets), _ = rec.stage("load_excel", _ingest, path, os.path.basename(path))
+    df, _ = rec.stage("load_sheet", load_sheet, file_hash, sheets[0])
+    (df, _report), _ = rec.stage("preprocess_df", detect_datetimes, df)
+    cat_cols, num_cols, date_cols = filter_columns(df)
+    date_col = next((col for col in date_cols if "hora" in col.lower()), date_cols[0] if date_cols else None)
+    engine, _ = rec.stage("filter_engine", FilterEngine, df)
+    rec.stage("filter_widgets", _filter_widgets, engine, cat_cols, num_cols, date_cols)
+    cat_filters, num_filters, date_range = _filters(engine, df, date_col)
+    (filtered, _), result = rec.stage("apply_filters", filter_rows, engine, df, cat_filters, num_filters,
+                                      date_col, date_range)
+    result["linhas_filtradas"] = len(filtered)
+    # Rerun com um filtro alterado: os demais predicados vêm da memória do motor
+    num_filters = {col: (lo, hi * 0.99) for col, (lo, hi) in num_filters.items()}
+    rec.stage("apply_filters_rerun", filter_rows, engine, df, cat_filters, num_filters, date_col, date_range)
+    (cube, _), result = rec.stage("kpis", _kpis, filtered, num_cols, date_col)
+    result["linhas_cubo"] = len(cube)
+    payloads, result = rec.stage("charts", _charts, filtered, cube, date_col)
+    result["payload_kb"] = {name: size / 1024 for name, size in payloads.items()}
+    (html, info), result = rec.stage("map", _map, filtered)
+    result.update(html_kb=html / 1024, **info)
+    rules_engine, _ = rec.stage("maintenance", _maintenance, filtered, date_col)
+    rec.stage("maintenance_rerun", rules_engine.evaluate, filtered, [("horimetro", 1000.0)], SERVICE_STATUSES)
+    rec.stage("grid_page", _grid, filtered)
+    writers = {"csv": export_csv, "xlsx": export_excel, "parquet": export_parquet, "pdf": export_pdf}
+    for ext in exports:
+        if ext == "xlsx" and len(filtered) > XLSX_MAX_ROWS:
+            continue
+        target = export_path(export_key("benchmark", rows, kind, time.time()), ext)
+        rec.stage(f"export_{ext}", writers[ext], filtered, target)
+        rec.results[-1]["size_mb"] = os.path.getsize(target) / 2 ** 20
+        os.remove(target)
+    return rec.results
+
+
+def _key(result):
+    return result["rows"], result["format"], result["stage"]
+
+
+# Regressões: tempo ou pico de memória acima da linha de base além da tolerância (e de um piso absoluto)
+def compare(results, baseline, tolerance=TOLERANCE):
+    previous = {_key(r): r for r in baseline.get("results", [])}
+    comparison = []
+    for result in results:
+        base = previous.get(_key(result))
+        if base is None or result["seconds"] is None:
+            continue
+        row = {"rows": result["rows"], "format": result["format"], "stage": result["stage"]}
+        regressed = False
+        for field, floor in (("seconds", MIN_SECONDS), ("python_heap_peak_mb", MIN_PEAK_MB),
+                             ("rss_growth_mb", MIN_PEAK_MB)):
+            now, before = result.get(field), base.get(field)
+            if now is None or before is None:
+                continue
+            row[f"{field}_base"] = before
+            row[f"{field}_ratio"] = now / before if before else None
+            if now > before * (1 + tolerance) and now - before > floor:
+                regressed = True
+        row["regressao"] = regressed
+        comparison.append(row)
+    return comparison
+
+
+def _meta(memory):
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "memoria_tracemalloc": memory,
+        "memoria_rss": _current_rss() is not None,
+        "criado": pd.Timestamp.now().isoformat(timespec="seconds"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do dashboard em dados sintéticos.")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], help="Tamanhos: " + ", ".join(SIZES) + " ou número")
+    parser.add_argument("--formats", nargs="+", default=["xlsx", "parquet"], choices=FORMATS)
+    parser.add_argument("--exports", nargs="*", default=list(EXPORTS), choices=EXPORTS)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"Grava os resultados como nova linha de base (em --baseline, ou {BASELINE_PATH})")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--no-memory", action="store_true", help="Desliga o tracemalloc (tempos sem a sobrecarga)")
+    parser.add_argument("--workdir", help="Diretório para os arquivos sintéticos (reaproveitados entre execuções)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.save_baseline and not args.baseline:
+        args.baseline = BASELINE_PATH
+
+    memory = not args.no_memory
+    workdir = args.workdir or tempfile.mkdtemp(prefix="analyzer-data-")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    try:
+        for size in args.sizes:
+            rows = parse_size(size)
+            for kind in args.formats:
+                if kind == "xlsx" and rows > XLSX_MAX_ROWS:
+                    print(f"{rows} linhas em xlsx: acima do limite do Excel, ignorado", file=sys.stderr)
+                    continue
+                print(f"{rows} linhas, {kind}", file=sys.stderr)
+                results += run_case(rows, kind, workdir, args.exports, memory, args.seed)
+    finally:
+        if _OWN_CACHE:
+            shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": _meta(memory), "results": results}
+    exit_code = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("memoria_tracemalloc") != memory:
+            print("Aviso: linha de base medida com outra configuração de tracemalloc", file=sys.stderr)
+        report["comparacao"] = compare(results, baseline, args.tolerance)
+        regressions = [row for row in report["comparacao"] if row["regressao"]]
+        for row in regressions:
+            print(f"REGRESSÃO {row['rows']} {row['format']} {row['stage']}: "
+                  f"tempo x{row.get('seconds_ratio') or 0:.2f}, heap x{row.get('python_heap_peak_mb_ratio') or 0:.2f}, "
+                  f"RSS x{row.get('rss_growth_mb_ratio') or 0:.2f}",
+                  file=sys.stderr)
+        exit_code = 1 if regressions else 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Linha de base gravada em {args.baseline}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Redução de dados dos gráficos: estatísticas calculadas no servidor e nuvens de pontos limitadas
+POINT_BUDGET = 5_000
+
+
+def _finite(values):
+    values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+# Quartis, cercas (dado mais extremo dentro de 1,5 IQR, como no Plotly) e outliers
+def box_stats(values):
+    values = _finite(values)
+    if values.size == 0:
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "q1": q1, "median": median, "q3": q3, "mean": values.mean(),
+        "lowerfence": inside.min(), "upperfence": inside.max(),
+        "outliers": values[(values < inside.min()) | (values > inside.max())],
+        "count": values.size,
+    }
+
+
+# Largest-Triangle-Three-Buckets: mantém a forma da série com n_out pontos
+def lttb(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        avg_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+# Box plot por grupo a partir das estatísticas pré-calculadas, com os outliers reais sobrepostos;
+# acima do limite ficam os mais distantes das cercas (resultado estável entre reruns)
+def grouped_box_figure(df, x, y, budget=POINT_BUDGET):
+    groups = df.groupby(x, observed=True, sort=True).indices
+    fig = go.Figure()
+    names, stats = [], []
+    for name, rows in groups.items():
+        group_stats = box_stats(df[y].iloc[rows])
+        if group_stats is not None:
+            names.append(name)
+            stats.append(group_stats)
+    if not stats:
+        return fig, 0
+    positions = np.arange(len(stats))
+    fig.add_trace(go.Box(
+        x=positions, name=y, boxpoints=False, showlegend=False,
+        q1=[s["q1"] for s in stats], median=[s["median"] for s in stats], q3=[s["q3"] for s in stats],
+        lowerfence=[s["lowerfence"] for s in stats], upperfence=[s["upperfence"] for s in stats],
+        mean=[s["mean"] for s in stats],
+    ))
+    outliers = np.concatenate([s["outliers"] for s in stats])
+    owner = np.repeat(positions, [s["outliers"].size for s in stats])
+    distance = np.concatenate([
+        np.maximum(s["lowerfence"] - s["outliers"], s["outliers"] - s["upperfence"]) for s in stats
+    ])
+    shown = np.sort(np.argsort(-distance, kind="stable")[:budget])
+    if shown.size:
+        fig.add_trace(go.Scattergl(
+            x=owner[shown], y=outliers[shown], mode="markers", name="outliers", showlegend=False,
+            marker={"size": 4, "opacity": 0.6},
+        ))
+    fig.update_layout(xaxis={"tickvals": positions.tolist(), "ticktext": [str(n) for n in names], "title": x},
+                      yaxis_title=y)
+    return fig, outliers.size - shown.size
+
+
+# Histograma com as classes calculadas no servidor e box marginal pré-calculado
+def histogram_figure(values, name, nbins=25):
+    values = _finite(values)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    if values.size:
+        counts, edges = np.histogram(values, bins=nbins)
+        fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=name,
+                             showlegend=False), row=2, col=1)
+        stats = box_stats(values)
+        fig.add_trace(go.Box(
+            y=[name], orientation="h", boxpoints=False, showlegend=False, name=name,
+            q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+            lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]], mean=[stats["mean"]],
+        ), row=1, col=1)
+    fig.update_layout(title=f"Distribuição de {name}", bargap=0)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_yaxes(title_text="count", row=2, col=1)
+    fig.update_xaxes(title_text=name, row=2, col=1)
+    return fig
+
+
+# Série temporal em WebGL, reduzida por LTTB acima do limite de pontos
+def timeseries_figure(dates, values, name, budget=POINT_BUDGET):
+    frame = pd.DataFrame({"x": dates, "y": pd.to_numeric(values, errors="coerce")}).dropna().sort_values("x")
+    x = frame["x"].to_numpy(dtype="datetime64[ns]")
+    y = frame["y"].to_numpy(dtype="float64")
+    keep = lttb(x.view("i8").astype("float64"), y, budget)
+    fig = go.Figure(go.Scattergl(x=x[keep], y=y[keep], mode="lines", name=name))
+    fig.update_layout(title=f"Evolução de {name}", yaxis_title=name)
+    return fig, len(x) - len(keep)
+
+
+# Tamanho do JSON enviado ao navegador e tempo de serialização
+def figure_payload(fig):
+    start = time.perf_counter()
+    payload = fig.to_json()
+    return len(payload.encode("utf-8")), time.perf_counter() - start
@@ -0,0 +1,147 @@
+import re
+import time
+
+import pandas as pd
+
+# Detecção de colunas de data/hora: um formato explícito por coluna, inferido numa amostra
+DATE_HINTS = ("date", "data", "hora")
+SAMPLE_SIZE = 1_000
+MIN_SUCCESS = 0.9
+
+# Ordem importa no empate: os formatos DD-MM-AAAA das máquinas vêm antes dos americanos
+DATE_FORMATS = [
+    "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M", "%d-%m-%Y",
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+    "%d.%m.%Y %H:%M:%S", "%d.%m.%Y",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S", "%Y/%m/%d",
+    "%d-%m-%y", "%d/%m/%y",
+]
+TIME_FORMATS = ["%H:%M:%S", "%H:%M"]
+
+
+def is_candidate(col):
+    name = str(col).lower()
+    return any(h in name for h in DATE_HINTS)
+
+
+def _sample(strings):
+    values = strings.dropna().unique()
+    if len(values) > SAMPLE_SIZE:
+        values = pd.Series(values).sample(SAMPLE_SIZE, random_state=0).to_numpy()
+    return pd.Series(values, dtype=object)
+
+
+# Testa cada formato na amostra e devolve (formato, taxa de sucesso) do melhor
+def infer_format(values):
+    sample = _sample(values.astype(str).str.strip().where(values.notna()))
+    if sample.empty:
+        return None, 0.0
+    best, best_rate = None, 0.0
+    for fmt in DATE_FORMATS + TIME_FORMATS:
+        rate = pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+        if rate > best_rate:
+            best, best_rate = fmt, rate
+        if rate == 1.0:
+            break
+    return best, float(best_rate)
+
+
+def is_time_format(fmt):
+    return fmt in TIME_FORMATS
+
+
+def parse_with_format(values, fmt):
+    strings = values.astype(str).str.strip().where(values.notna())
+    if is_time_format(fmt):
+        if fmt == "%H:%M":
+            strings = strings + ":00"
+        return pd.to_timedelta(strings, errors="coerce")
+    return pd.to_datetime(strings, format=fmt, errors="coerce")
+
+
+def _date_only(values):
+    present = values.dropna()
+    return not present.empty and bool((present == present.dt.normalize()).all())
+
+
+def _stem(col, token):
+    return re.sub(token, "", str(col).lower()).strip(" _-/")
+
+
+# Junta cada coluna de hora à coluna de data correspondente (mesmo sufixo, ou o único par)
+def _pair_columns(date_cols, time_cols):
+    pairs = []
+    for time_col in time_cols:
+        stem = _stem(time_col, "hora")
+        match = next((d for d in date_cols if _stem(d, "data|date") == stem), None)
+        if match is None and len(date_cols) == 1 and len(time_cols) == 1:
+            match = date_cols[0]
+        if match is not None:
+            pairs.append((match, time_col))
+    return pairs
+
+
+# Converte as colunas candidatas sem alterar o DataFrame de entrada; devolve (df, relatório)
+def detect_datetimes(df):
+    parsed, report = {}, []
+    date_only, time_cols = [], []
+    for col in df.columns:
+        if not is_candidate(col):
+            continue
+        values = df[col]
+        start = time.perf_counter()
+        present = int(values.notna().sum())
+        if pd.api.types.is_datetime64_any_dtype(values):
+            fmt, failures, status = "nativo", 0, "ok"
+            result = values
+        elif pd.api.types.is_numeric_dtype(values) or present == 0:
+            continue
+        else:
+            fmt, rate = infer_format(values)
+            if fmt is None or rate < MIN_SUCCESS:
+                report.append({
+                    "Coluna": col, "Formato": fmt or "-", "Linhas": present, "Falhas": present,
+                    "Taxa de falha (%)": 100.0, "Tempo (ms)": (time.perf_counter() - start) * 1000,
+                    "Status": "mantida como texto",
+                })
+                continue
+            result = parse_with_format(values, fmt)
+            failures = int(result.isna().sum()) - (len(values) - present)
+            status = "ok" if failures == 0 else "convertida com falhas"
+            parsed[col] = result
+        if pd.api.types.is_timedelta64_dtype(result):
+            time_cols.append(col)
+        elif _date_only(result):
+            date_only.append(col)
+        report.append({
+            "Coluna": col, "Formato": fmt, "Linhas": present, "Falhas": failures,
+            "Taxa de falha (%)": 100.0 * failures / present if present else 0.0,
+            "Tempo (ms)": (time.perf_counter() - start) * 1000, "Status": status,
+        })
+    for date_col, time_col in _pair_columns(date_only, time_cols):
+        start = time.perf_counter()
+        dates = parsed.get(date_col, df[date_col])
+        times = parsed.get(time_col, df[time_col])
+        name = f"{date_col} {time_col}"
+        parsed[name] = dates.dt.normalize() + times
+        present = int(dates.notna().sum())
+        failures = int((parsed[name].isna() & dates.notna()).sum())
+        report.append({
+            "Coluna": name, "Formato": f"{date_col} + {time_col}", "Linhas": present, "Falhas": failures,
+            "Taxa de falha (%)": 100.0 * failures / present if present else 0.0,
+            "Tempo (ms)": (time.perf_counter() - start) * 1000, "Status": "combinada",
+        })
+        # A hora isolada continua como timedelta: fica fora das colunas numéricas (numeric_columns) e
+        # dos filtros categóricos, que como texto teriam um valor por segundo do dia
+        for entry in report:
+            if entry["Coluna"] == time_col:
+                entry["Status"] = f"combinada em {name}"
+    if parsed:
+        df = df.assign(**parsed)
+    return df, pd.DataFrame(report)
+
+
+# Colunas numéricas para KPIs, gráficos e indicadores; durações (timedelta) ficam de fora
+def numeric_columns(df):
+    return df.select_dtypes(include="number", exclude="timedelta").columns.tolist()
@@ -0,0 +1,206 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from sheet_cache import CACHE_DIR
+
+# Exportações geradas sob demanda em arquivos temporários, reaproveitadas pelo hash do estado dos filtros
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports")
+EXPORT_KEEP = 32
+EXPORT_CHUNK_ROWS = 50_000
+EXCEL_MAX_ROWS = 1_048_575
+PDF_MAX_ROWS = 5_000
+PDF_BLOCK_ROWS = 1_000
+
+
+def export_key(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def export_path(key, ext):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return os.path.join(EXPORT_DIR, f"{key}.{ext}")
+
+
+# Mantém apenas as exportações mais recentes no disco
+def _prune():
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    files = [os.path.join(EXPORT_DIR, f) for f in os.listdir(EXPORT_DIR) if not f.endswith(".tmp")]
+    files.sort(key=os.path.getmtime, reverse=True)
+    for path in files[EXPORT_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _finish(tmp, path):
+    os.replace(tmp, path)
+    _prune()
+    return path
+
+
+# Blocos (DataFrame, fração) de um DataFrame, ou já prontos quando vêm de uma consulta em lotes
+def _blocks(df, size=EXPORT_CHUNK_ROWS):
+    if not isinstance(df, pd.DataFrame):
+        yield from df
+        return
+    total = len(df)
+    for start in range(0, max(total, 1), size):
+        yield df.iloc[start:start + size], min(start + size, total) / total if total else 1.0
+
+
+def export_csv(df, path, progress=None):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        for i, (block, fraction) in enumerate(_blocks(df)):
+            block.to_csv(f, index=False, header=i == 0)
+            if progress is not None:
+                progress(fraction)
+    return _finish(tmp, path)
+
+
+# Excel com xlsxwriter em modo de memória constante (linhas gravadas em ordem e descarregadas);
+# acima do limite de linhas do Excel os dados continuam em novas abas. Como no DataFrame.to_excel,
+# o índice (posição original das linhas filtradas) sai na primeira coluna
+def export_excel(df, path, progress=None, index=True):
+    import xlsxwriter
+    tmp = f"{path}.{os.getpid()}.tmp"
+    wb = xlsxwriter.Workbook(tmp, {"constant_memory": True, "nan_inf_to_errors": True})
+    date_fmt = wb.add_format({"num_format": "dd/mm/yyyy hh:mm:ss"})
+    offset = 1 if index else 0
+    header = ([str(df.index.name or "")] if index else []) + [str(col) for col in df.columns]
+    date_positions = [i + offset for i, col in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[col])]
+    ws, row = None, EXCEL_MAX_ROWS + 1
+    try:
+        for block, fraction in _blocks(df):
+            values = block.astype(object).where(block.notna(), None).to_numpy()
+            if index:
+                values = np.column_stack([block.index.to_numpy(dtype=object), values])
+            for record in values:
+                if row > EXCEL_MAX_ROWS:
+                    sheets = len(wb.worksheets())
+                    ws = wb.add_worksheet("Dados" if sheets == 0 else f"Dados {sheets + 1}")
+                    ws.write_row(0, 0, header)
+                    row = 1
+                ws.write_row(row, 0, record)
+                for j in date_positions:
+                    if record[j] is not None:
+                        ws.write_datetime(row, j, record[j], date_fmt)
+                row += 1
+            if ws is None:
+                ws = wb.add_worksheet("Dados")
+                ws.write_row(0, 0, header)
+            if progress is not None:
+                progress(fraction)
+    finally:
+        wb.close()
+    return _finish(tmp, path)
+
+
+# Parquet com um único esquema para todos os blocos: o do DataFrame inteiro (um bloco só de nulos
+# não define o tipo da coluna) ou o informado, ex. o da consulta na base consolidada
+def export_parquet(df, path, progress=None, schema=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if schema is None and isinstance(df, pd.DataFrame):
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+    writer = None
+    try:
+        for block, fraction in _blocks(df):
+            if writer is None:
+                schema = schema or pa.Schema.from_pandas(block, preserve_index=False)
+                writer = pq.ParquetWriter(tmp, schema)
+            writer.write_table(pa.Table.from_pandas(block, schema=schema, preserve_index=False))
+            if progress is not None:
+                progress(fraction)
+    finally:
+        if writer is not None:
+            writer.close()
+    return _finish(tmp, path)
+
+
+def format_value(valor):
+    if valor is None:
+        return "N/A"
+    return f"{valor:.2f}" if isinstance(valor, float) else str(valor)
+
+
+# Linhas de texto da tabela, formatadas coluna a coluna (sem iterrows)
+def format_rows(df, width=12):
+    cols = [df[col].astype(str).str.slice(0, width) for col in df.columns]
+    if not cols:
+        return []
+    return cols[0].str.cat(cols[1:], sep=" | ").tolist()
+
+
+def _chart_image(title, series):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 4.5), dpi=100)
+    ax.bar([str(i) for i in series.index], series.to_numpy())
+    ax.set_title(title)
+    ax.tick_params(axis="x", labelrotation=45, labelsize=8)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    buf.seek(0)
+    return buf
+
+
+def _summary_pages(c, title, total, kpis, charts):
+    from reportlab.lib.utils import ImageReader
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(30, 550, title)
+    c.setFont("Helvetica", 12)
+    c.drawString(30, 530, f"Total registros: {total}")
+    for i, (nome, valor) in enumerate(kpis):
+        x, y = 30 + (i % 4) * 185, 440 - (i // 4) * 90
+        c.roundRect(x, y, 175, 75, 8)
+        c.setFont("Helvetica", 9)
+        c.drawCentredString(x + 87, y + 55, nome[:34])
+        c.setFont("Helvetica-Bold", 18)
+        c.drawCentredString(x + 87, y + 22, format_value(valor))
+    for chart_title, series in charts:
+        if series is None or series.empty:
+            continue
+        c.showPage()
+        c.drawImage(ImageReader(_chart_image(chart_title, series)), 30, 90, width=730, height=430)
+
+
+# Relatório PDF: páginas de resumo (KPIs e gráficos agregados) e tabela limitada a max_rows linhas
+def export_pdf(df, path, title="Relatório Operacional", kpis=(), charts=(), max_rows=PDF_MAX_ROWS, progress=None):
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.pdfgen import canvas
+    tmp = f"{path}.{os.getpid()}.tmp"
+    c = canvas.Canvas(tmp, pagesize=landscape(letter))
+    _summary_pages(c, title, len(df), kpis, charts)
+    c.showPage()
+    shown = min(len(df), max_rows)
+    c.setFont("Helvetica", 12)
+    y = 550
+    if shown < len(df):
+        c.drawString(30, y, f"Exibindo as primeiras {shown} de {len(df)} linhas.")
+        y -= 30
+    c.drawString(30, y, " | ".join(str(col)[:13] for col in df.columns))
+    y -= 18
+    for start in range(0, shown, PDF_BLOCK_ROWS):
+        for line in format_rows(df.iloc[start:min(start + PDF_BLOCK_ROWS, shown)]):
+            c.drawString(30, y, line)
+            y -= 18
+            if y < 40:
+                c.showPage()
+                c.setFont("Helvetica", 12)
+                y = 520
+        if progress is not None:
+            progress(min(start + PDF_BLOCK_ROWS, shown) / shown)
+    c.save()
+    return _finish(tmp, path)
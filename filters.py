@@ -0,0 +1,170 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from datetimes import numeric_columns
+
+# Colunas categóricas com até este número de valores ganham um bitmap por valor
+BITMAP_MAX_VALUES = 256
+MEMO_SIZE = 32
+
+
+# Predicados efetivos de qualquer índice com values/bounds (motor em memória ou base consolidada);
+# filtros no valor padrão (tudo selecionado / intervalo completo) são ignorados
+def effective_predicates(index, cat_filters, num_filters, date_col=None, date_range=None):
+    keys = []
+    if date_col and date_range and len(date_range) == 2:
+        start = pd.to_datetime(date_range[0])
+        end = pd.to_datetime(date_range[1]) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+        low, high = index.bounds(date_col)
+        if not (start <= low and end >= high):
+            keys.append(("date", date_col, start.isoformat(), end.isoformat()))
+    for col, values in cat_filters.items():
+        if not values:
+            continue
+        options = index.values(col)
+        if len(values) >= len(options) and set(values) >= set(options):
+            continue
+        keys.append(("cat", col, tuple(sorted(values, key=str))))
+    for col, (min_v, max_v) in num_filters.items():
+        low, high = index.bounds(col)
+        if min_v <= low and max_v >= high:
+            continue
+        keys.append(("num", col, float(min_v), float(max_v)))
+    return tuple(keys)
+
+
+# Colunas que ganham filtro na barra lateral: (categóricas, numéricas, datas)
+def filter_columns(df):
+    cat_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+    date_cols = df.select_dtypes(include="datetime").columns.tolist()
+    return cat_cols, numeric_columns(df), date_cols
+
+
+# Linhas selecionadas pelos filtros (sem cópia quando nenhum está ativo) e os predicados efetivos
+def filter_rows(engine, df, cat_filters, num_filters, date_col=None, date_range=None):
+    mask, predicates = engine.mask(cat_filters, num_filters, date_col, date_range)
+    return (df if mask is None else df[mask]), predicates
+
+
+class FilterEngine:
+    # Índices construídos sob demanda, uma vez por aba; cada predicado é memorizado pela sua chave,
+    # de modo que um rerun só recalcula o filtro que mudou
+    def __init__(self, df):
+        self._df = df
+        self._n = len(df)
+        self._lock = threading.Lock()
+        self._sorted = {}
+        self._codes = {}
+        self._bounds = {}
+        self._values = {}
+        self._memo = OrderedDict()
+
+    def values(self, col):
+        with self._lock:
+            if col not in self._values:
+                uniques = self._categorical(col)[0]
+                try:
+                    self._values[col] = sorted(uniques)
+                except TypeError:
+                    self._values[col] = sorted(uniques, key=str)
+            return self._values[col]
+
+    def bounds(self, col):
+        with self._lock:
+            if col not in self._bounds:
+                s = self._df[col]
+                self._bounds[col] = (s.min(), s.max())
+            return self._bounds[col]
+
+    def _sortable(self, col):
+        s = self._df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            values = s.to_numpy(dtype="datetime64[ns]").view("i8")
+            return values, ~s.isna().to_numpy()
+        values = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return values, ~np.isnan(values)
+
+    def _sorted_index(self, col):
+        if col not in self._sorted:
+            values, valid = self._sortable(col)
+            rows = np.flatnonzero(valid)
+            order = rows[np.argsort(values[rows], kind="stable")]
+            self._sorted[col] = (order, values[order])
+        return self._sorted[col]
+
+    def _categorical(self, col):
+        if col not in self._codes:
+            codes, uniques = pd.factorize(self._df[col], sort=False)
+            uniques = pd.Index(np.asarray(uniques, dtype=object))
+            bitmaps, nulls = None, None
+            if len(uniques) <= BITMAP_MAX_VALUES:
+                bitmaps = np.stack([np.packbits(codes == i) for i in range(len(uniques))]) if len(uniques) else None
+                nulls = np.packbits(codes == -1)
+            self._codes[col] = (uniques, codes, bitmaps, nulls)
+        return self._codes[col]
+
+    def _range_mask(self, col, lo, hi):
+        order, sorted_values = self._sorted_index(col)
+        start = np.searchsorted(sorted_values, lo, side="left")
+        stop = np.searchsorted(sorted_values, hi, side="right")
+        mask = np.zeros(self._n, dtype=bool)
+        mask[order[start:stop]] = True
+        return mask
+
+    def _category_mask(self, col, values):
+        uniques, codes, bitmaps, nulls = self._categorical(col)
+        selected = uniques.get_indexer(pd.Index(list(values), dtype=object))
+        selected = np.unique(selected[selected >= 0])
+        if bitmaps is None:
+            # Alta cardinalidade: tabela de consulta sobre os códigos (o -1 cai na última posição, False)
+            lut = np.zeros(len(uniques) + 1, dtype=bool)
+            lut[selected] = True
+            return lut[codes]
+        if len(selected) <= len(uniques) // 2:
+            packed = np.bitwise_or.reduce(bitmaps[selected], axis=0) if len(selected) else np.zeros_like(nulls)
+        else:
+            others = np.setdiff1d(np.arange(len(uniques)), selected)
+            excluded = np.bitwise_or.reduce(bitmaps[others], axis=0) if len(others) else np.zeros_like(nulls)
+            packed = ~(excluded | nulls)
+        return np.unpackbits(packed, count=self._n).astype(bool)
+
+    def _predicate_mask(self, key):
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+        kind, col = key[0], key[1]
+        if kind == "cat":
+            mask = self._category_mask(col, key[2])
+        elif kind == "date":
+            mask = self._range_mask(col, pd.Timestamp(key[2]).value, pd.Timestamp(key[3]).value)
+        else:
+            mask = self._range_mask(col, key[2], key[3])
+        self._remember(key, mask)
+        return mask
+
+    def _remember(self, key, mask):
+        self._memo[key] = mask
+        while len(self._memo) > MEMO_SIZE:
+            self._memo.popitem(last=False)
+
+    def predicates(self, cat_filters, num_filters, date_col=None, date_range=None):
+        return effective_predicates(self, cat_filters, num_filters, date_col, date_range)
+
+    # Máscara booleana das linhas selecionadas (None = sem filtro) e a chave do estado dos filtros
+    def mask(self, cat_filters, num_filters, date_col=None, date_range=None):
+        keys = self.predicates(cat_filters, num_filters, date_col, date_range)
+        if not keys:
+            return None, keys
+        with self._lock:
+            combined = self._memo.get(keys)
+            if combined is None:
+                combined = self._predicate_mask(keys[0]).copy()
+                for key in keys[1:]:
+                    combined &= self._predicate_mask(key)
+                self._remember(keys, combined)
+            else:
+                self._memo.move_to_end(keys)
+        return combined, keys
@@ -0,0 +1,93 @@
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster, HeatMap
+
+# Camada geográfica escalável: índice ordenado por latitude, consulta pela área visível
+# e agregação em grade quando os pontos excedem o orçamento
+POINT_BUDGET = 2_000
+TILE_PIXELS = 256
+CELL_PIXELS = 24
+DEFAULT_ZOOM = 12
+
+
+class GeoIndex:
+    def __init__(self, lat, lon):
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        lat, lon = lat[valid], lon[valid]
+        order = np.argsort(lat, kind="stable")
+        self.lat = lat[order]
+        self.lon = lon[order]
+        # Centro calculado uma vez por seleção de filtros
+        self.center = [float(lat.mean()), float(lon.mean())] if len(lat) else None
+
+    def __len__(self):
+        return len(self.lat)
+
+    # Pontos dentro de (sul, oeste, norte, leste); None devolve todos
+    def query(self, bounds=None):
+        if bounds is None:
+            return self.lat, self.lon
+        south, west, north, east = bounds
+        start = np.searchsorted(self.lat, south, side="left")
+        stop = np.searchsorted(self.lat, north, side="right")
+        lat, lon = self.lat[start:stop], self.lon[start:stop]
+        inside = (lon >= west) & (lon <= east)
+        return lat[inside], lon[inside]
+
+
+def cell_size(zoom):
+    return 360.0 / (2 ** zoom * TILE_PIXELS) * CELL_PIXELS
+
+
+# Agrega os pontos numa grade proporcional ao zoom, dobrando a célula até caber no orçamento
+def bin_points(lat, lon, zoom, budget=POINT_BUDGET):
+    if len(lat) == 0:
+        return lat, lon, np.zeros(0, dtype=np.int64)
+    size = cell_size(zoom)
+    while True:
+        iy = np.floor(lat / size).astype(np.int64)
+        ix = np.floor(lon / size).astype(np.int64)
+        iy -= iy.min()
+        ix -= ix.min()
+        keys = iy * (int(ix.max()) + 1) + ix
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        if len(counts) <= budget:
+            break
+        size *= 2
+    return np.bincount(inverse, weights=lat) / counts, np.bincount(inverse, weights=lon) / counts, counts
+
+
+def parse_view(state):
+    if not state or not state.get("bounds"):
+        return None, None
+    sw, ne = state["bounds"].get("_southWest"), state["bounds"].get("_northEast")
+    if not sw or not ne or sw.get("lat") is None:
+        return None, state.get("zoom")
+    return (sw["lat"], sw["lng"], ne["lat"], ne["lng"]), state.get("zoom")
+
+
+def base_map(index, zoom=DEFAULT_ZOOM):
+    return folium.Map(location=index.center, zoom_start=zoom, tiles="OpenStreetMap")
+
+
+# Camada da área visível: pontos agrupados abaixo do orçamento, senão grade ou mapa de calor
+def build_layer(index, bounds=None, zoom=DEFAULT_ZOOM, mode="grade", budget=POINT_BUDGET):
+    lat, lon = index.query(bounds)
+    layer = folium.FeatureGroup(name="Operações")
+    if len(lat) <= budget:
+        if len(lat):
+            FastMarkerCluster(np.column_stack([lat, lon]).tolist()).add_to(layer)
+        return layer, {"visiveis": len(lat), "desenhados": len(lat), "celulas": 0}
+    cell_lat, cell_lon, counts = bin_points(lat, lon, zoom or DEFAULT_ZOOM, budget)
+    if mode == "calor":
+        HeatMap(np.column_stack([cell_lat, cell_lon, counts]).tolist(), radius=18).add_to(layer)
+    else:
+        radius = 4 + 3 * np.log10(counts)
+        for y, x, n, r in zip(cell_lat, cell_lon, counts, radius):
+            folium.CircleMarker(
+                location=[y, x], radius=float(r), color="#007AFF", fill=True, fill_opacity=0.6,
+                tooltip=f"{int(n)} pontos",
+            ).add_to(layer)
+    return layer, {"visiveis": len(lat), "desenhados": len(counts), "celulas": len(counts)}
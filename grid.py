@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Tabela paginada no servidor: ordenação e busca resolvidas sobre índices memorizados por coluna,
+# e só a janela visível (página atual mais as seguintes, pré-carregadas) vira uma tabela Arrow
+PAGE_SIZES = (50, 100, 250, 500)
+PREFETCH_PAGES = 2
+MEMO_SIZE = 16
+
+
+class GridIndex:
+    def __init__(self, df):
+        self._df = df
+        self._n = len(df)
+        self._lock = threading.Lock()
+        self._orders = {}
+        self._codes = {}
+        self._memo = OrderedDict()
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def columns(self):
+        return self._df.columns.tolist()
+
+    @property
+    def text_columns(self):
+        return self._df.select_dtypes(include=["object", "string", "category"]).columns.tolist()
+
+    def _remember(self, key, value):
+        self._memo[key] = value
+        while len(self._memo) > MEMO_SIZE:
+            self._memo.popitem(last=False)
+
+    # Posições em ordem crescente (nulos à parte); a ordem decrescente é a mesma lista invertida
+    def _order(self, col):
+        if col not in self._orders:
+            s = self._df[col]
+            if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+                valid = s.notna().to_numpy()
+                values = s.to_numpy(dtype="datetime64[ns]").view("i8") if pd.api.types.is_datetime64_any_dtype(s) \
+                    else pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            else:
+                values = self._factorized(col, sort=True)[0]
+                valid = values >= 0
+            rows = np.flatnonzero(valid)
+            self._orders[col] = (rows[np.argsort(values[rows], kind="stable")], np.flatnonzero(~valid))
+        return self._orders[col]
+
+    def _factorized(self, col, sort=False):
+        key = (col, sort)
+        if key not in self._codes:
+            s = self._df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype) and not sort:
+                self._codes[key] = (s.cat.codes.to_numpy(), s.cat.categories)
+            else:
+                self._codes[key] = pd.factorize(s, sort=sort)
+        return self._codes[key]
+
+    # Busca sem diferenciar maiúsculas, feita sobre os valores distintos de cada coluna de texto
+    def _matches(self, term, columns):
+        mask = np.zeros(self._n, dtype=bool)
+        for col in columns:
+            codes, uniques = self._factorized(col)
+            hit = pd.Index(uniques).astype(str).str.contains(term, case=False, regex=False)
+            lut = np.append(np.asarray(hit, dtype=bool), False)
+            mask |= lut[codes]
+        return mask
+
+    # Posições das linhas na ordem e com a busca pedidas
+    def view(self, sort_col=None, ascending=True, term="", search_columns=()):
+        term = term.strip()
+        search_columns = tuple(col for col in search_columns if col in self.text_columns) if term else ()
+        key = (sort_col, ascending, term, search_columns)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+            if sort_col:
+                rows, nulls = self._order(sort_col)
+                positions = np.concatenate([rows if ascending else rows[::-1], nulls])
+            else:
+                positions = np.arange(self._n)
+            if search_columns:
+                positions = positions[self._matches(term, search_columns)[positions]]
+            self._remember(key, positions)
+            return positions
+
+    # Janela [start, stop) da visão como tabela Arrow, apenas com as colunas escolhidas
+    def window(self, positions, start, stop, columns):
+        import pyarrow as pa
+        col_positions = [self._df.columns.get_loc(col) for col in columns]
+        block = self._df.iloc[positions[start:stop], col_positions]
+        return pa.Table.from_pandas(block, preserve_index=False)
@@ -0,0 +1,193 @@
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# Indicadores customizados: gramática aritmética restrita sobre colunas numéricas,
+# validada pela AST e avaliada de forma vetorizada (numexpr, ou NumPy como alternativa)
+_COLUMN_REF = re.compile(r"df\[\s*(['\"])(.*?)\1\s*\]|\[([^\[\]]+)\]")
+
+_BIN_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+    ast.Mod: np.mod,
+}
+_UNARY_OPS = {ast.USub: np.negative, ast.UAdd: np.positive}
+FUNCTIONS = {"sqrt": np.sqrt, "log": np.log, "log10": np.log10, "exp": np.exp, "abs": np.abs}
+AGGREGATES = {
+    "mean": np.nanmean,
+    "sum": np.nansum,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "std": np.nanstd,
+    "median": np.nanmedian,
+}
+
+# Tradução para SQL (base consolidada): agregações viram funções de janela sobre a seleção de abas
+_SQL_OPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Mod: "%"}
+_SQL_FUNCTIONS = {"sqrt": ("SQRT", ">="), "log": ("LN", ">"), "log10": ("LOG10", ">"), "exp": ("EXP", None), "abs": ("ABS", None)}
+_SQL_AGGREGATES = {"mean": "AVG", "sum": "SUM", "min": "MIN", "max": "MAX", "std": "STDDEV_POP", "median": "MEDIAN"}
+
+
+class IndicatorError(ValueError):
+    pass
+
+
+# Erros numéricos da avaliação (ex.: inteiro elevado a potência negativa) viram IndicatorError
+_RUNTIME_ERRORS = (ValueError, TypeError, ZeroDivisionError, FloatingPointError, OverflowError, KeyError)
+
+
+class CompiledIndicator:
+    def __init__(self, expression, tree, variables):
+        self.expression = expression
+        self.tree = tree
+        # Nome interno -> coluna do DataFrame
+        self.variables = variables
+
+    @property
+    def columns(self):
+        return sorted(set(self.variables.values()))
+
+    def evaluate(self, df):
+        env = {
+            name: pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            for name, col in self.variables.items()
+        }
+        try:
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                tree = _fold_aggregates(self.tree, env)
+                if numexpr is not None:
+                    result = numexpr.evaluate(ast.unparse(tree), local_dict=env)
+                else:
+                    result = _evaluate(tree.body, env)
+        except IndicatorError:
+            raise
+        except _RUNTIME_ERRORS as e:
+            raise IndicatorError(f"Falha ao calcular o indicador: {e}") from None
+        # ±inf (ex.: divisão por zero) vira nulo, como no caminho SQL da base consolidada
+        result = np.broadcast_to(result, (len(df),)).astype("float64")
+        return pd.Series(np.where(np.isfinite(result), result, np.nan), index=df.index)
+
+    # Expressão SQL equivalente; quote escapa o nome de uma coluna
+    def to_sql(self, quote):
+        return _to_sql(self.tree.body, self.variables, quote)
+
+
+def _placeholders(expression, columns):
+    variables = {}
+
+    def replace(match):
+        col = match.group(2) if match.group(2) is not None else match.group(3).strip()
+        if col not in columns:
+            raise IndicatorError(f"Coluna não encontrada: {col}")
+        name = next((k for k, v in variables.items() if v == col), f"_c{len(variables)}")
+        variables[name] = col
+        return name
+
+    return _COLUMN_REF.sub(replace, expression), variables
+
+
+def _validate(node, variables, columns, inside_aggregate=False):
+    if isinstance(node, ast.Expression):
+        return _validate(node.body, variables, columns)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        _validate(node.left, variables, columns, inside_aggregate)
+        _validate(node.right, variables, columns, inside_aggregate)
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        _validate(node.operand, variables, columns, inside_aggregate)
+    elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        pass
+    elif isinstance(node, ast.Name):
+        if node.id not in variables:
+            if node.id not in columns:
+                raise IndicatorError(f"Coluna não encontrada: {node.id} (use [Nome da coluna])")
+            variables[node.id] = node.id
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords and len(node.args) == 1:
+        name = node.func.id
+        if name in AGGREGATES:
+            if inside_aggregate:
+                raise IndicatorError("Agregações aninhadas não são permitidas.")
+            _validate(node.args[0], variables, columns, True)
+        elif name in FUNCTIONS:
+            _validate(node.args[0], variables, columns, inside_aggregate)
+        else:
+            raise IndicatorError(f"Função não permitida: {name}")
+    else:
+        raise IndicatorError(f"Elemento não permitido na expressão: {ast.dump(node)[:40]}")
+
+
+# Constantes como float, para que 2 ** -1 (e o mesmo no numexpr) não caia na potência inteira
+class _FloatConstants(ast.NodeTransformer):
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(value=float(node.value)), node)
+
+
+# Valida a expressão contra as colunas numéricas da aba
+def compile_indicator(expression, columns):
+    columns = set(columns)
+    text, variables = _placeholders(expression.strip(), columns)
+    if not text:
+        raise IndicatorError("Expressão vazia.")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise IndicatorError(f"Sintaxe inválida: {e.msg}") from None
+    _validate(tree, variables, columns)
+    if not variables:
+        raise IndicatorError("A expressão deve usar ao menos uma coluna.")
+    return CompiledIndicator(expression, ast.fix_missing_locations(_FloatConstants().visit(tree)), variables)
+
+
+def _evaluate(node, env):
+    if isinstance(node, ast.BinOp):
+        return _BIN_OPS[type(node.op)](_evaluate(node.left, env), _evaluate(node.right, env))
+    if isinstance(node, ast.UnaryOp):
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand, env))
+    if isinstance(node, ast.Constant):
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        return env[node.id]
+    return FUNCTIONS[node.func.id](_evaluate(node.args[0], env))
+
+
+# Agregações viram constantes antes da avaliação elemento a elemento
+def _fold_aggregates(tree, env):
+    class Folder(ast.NodeTransformer):
+        def visit_Call(self, node):
+            if node.func.id in AGGREGATES:
+                inner = _evaluate(node.args[0], env)
+                name = f"_k{sum(1 for k in env if k.startswith('_k'))}"
+                env[name] = float(AGGREGATES[node.func.id](np.asarray(inner, dtype="float64")))
+                return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+            return self.generic_visit(node)
+
+    return ast.fix_missing_locations(Folder().visit(ast.parse(ast.unparse(tree), mode="eval")))
+
+
+def _to_sql(node, variables, quote):
+    if isinstance(node, ast.BinOp):
+        left, right = _to_sql(node.left, variables, quote), _to_sql(node.right, variables, quote)
+        if isinstance(node.op, ast.Pow):
+            return f"POWER({left}, {right})"
+        return f"({left} {_SQL_OPS[type(node.op)]} {right})"
+    if isinstance(node, ast.UnaryOp):
+        return f"({'-' if isinstance(node.op, ast.USub) else '+'}{_to_sql(node.operand, variables, quote)})"
+    if isinstance(node, ast.Constant):
+        return repr(float(node.value))
+    if isinstance(node, ast.Name):
+        return f"CAST({quote(variables[node.id])} AS DOUBLE)"
+    inner = _to_sql(node.args[0], variables, quote)
+    if node.func.id in _SQL_AGGREGATES:
+        return f"{_SQL_AGGREGATES[node.func.id]}({inner}) OVER ()"
+    name, domain = _SQL_FUNCTIONS[node.func.id]
+    # Fora do domínio o resultado é nulo (NaN no pandas), em vez de erro na consulta
+    return f"(CASE WHEN {inner} {domain} 0 THEN {name}({inner}) END)" if domain else f"{name}({inner})"
@@ -0,0 +1,336 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datetimes import infer_format, is_candidate, is_time_format, parse_with_format
+
+# Ingestão em blocos: a memória de pico depende de CHUNK_ROWS, não do tamanho do arquivo
+CHUNK_ROWS = 50_000
+SAMPLE_ROWS = 5_000
+SUPPORTED_TYPES = ["xlsx", "csv", "tsv", "parquet"]
+
+CATEGORY_HINTS = ("operador", "equipamento", "talhão", "talhao", "fazenda", "frente", "turno", "status", "manut")
+COORD_HINTS = ("lat", "lon")
+
+_ARROW_TYPES = {
+    "Int16": pa.int16(),
+    "Int32": pa.int32(),
+    "Int64": pa.int64(),
+    "float32": pa.float32(),
+    "float64": pa.float64(),
+    "datetime64[ns]": pa.timestamp("ns"),
+    "category": pa.string(),
+    "string": pa.string(),
+}
+_NUMERIC_DTYPES = ("Int16", "Int32", "Int64", "float32", "float64")
+_PANDAS_INTS = {pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()}
+_CATEGORIES_KEY = b"analyzer.categories"
+
+
+# Tipos a alargar num bloco: {coluna: novo tipo}, todos de uma vez
+class _Widen(Exception):
+    def __init__(self, changes):
+        super().__init__(changes)
+        self.changes = changes
+
+
+def file_kind(name):
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    return ext if ext in SUPPORTED_TYPES else "xlsx"
+
+
+def list_sheets(path, kind, name):
+    if kind != "xlsx":
+        return [os.path.splitext(os.path.basename(name))[0]]
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        return [str(s) for s in wb.sheetnames]
+    finally:
+        wb.close()
+
+
+# Cabeçalho no mesmo padrão do pandas ("Unnamed: n" e sufixos ".1" para duplicadas)
+def _header(row):
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _iter_xlsx(path, sheet, chunk_rows):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet]
+        total = ws.max_row or 0
+        rows = ws.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        width = len(header)
+        buf, done, emitted = [], 1, False
+        for row in rows:
+            done += 1
+            if all(v is None for v in row):
+                continue
+            row = tuple(row[:width])
+            buf.append(row + (None,) * (width - len(row)))
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame.from_records(buf, columns=header), (done / total if total else None)
+                buf, emitted = [], True
+        if buf or not emitted:
+            yield pd.DataFrame.from_records(buf, columns=header), 1.0
+    finally:
+        wb.close()
+
+
+def _sniff_csv(path, kind):
+    with open(path, "rb") as f:
+        raw = f.read(64 * 1024)
+    try:
+        raw[:-4].decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+    if kind == "tsv":
+        return encoding, "\t"
+    try:
+        sep = csv.Sniffer().sniff(raw.decode(encoding, errors="replace"), delimiters=",;\t|").delimiter
+    except csv.Error:
+        sep = ","
+    return encoding, sep
+
+
+def _iter_csv(path, kind, chunk_rows):
+    encoding, sep = _sniff_csv(path, kind)
+    # Exportações brasileiras com ";" usam vírgula decimal
+    decimal = "," if sep == ";" else "."
+    total = os.path.getsize(path) or 1
+    with open(path, "rb") as f:
+        reader = pd.read_csv(f, sep=sep, decimal=decimal, encoding=encoding, chunksize=chunk_rows)
+        for chunk in reader:
+            yield chunk, min(f.tell() / total, 1.0)
+
+
+def _iter_parquet(path, chunk_rows):
+    pf = pq.ParquetFile(path)
+    total = pf.metadata.num_rows or 1
+    done = 0
+    for batch in pf.iter_batches(batch_size=chunk_rows):
+        done += batch.num_rows
+        yield batch.to_pandas(), done / total
+    if done == 0:
+        yield pf.schema_arrow.empty_table().to_pandas(), 1.0
+
+
+# Lê o arquivo em blocos de chunk_rows linhas, com a fração já lida (ou None)
+def iter_chunks(path, kind, sheet=None, chunk_rows=CHUNK_ROWS):
+    if kind == "xlsx":
+        chunks = _iter_xlsx(path, sheet, chunk_rows)
+    elif kind == "parquet":
+        chunks = _iter_parquet(path, chunk_rows)
+    else:
+        chunks = _iter_csv(path, kind, chunk_rows)
+    for chunk, fraction in chunks:
+        chunk.columns = [str(c) for c in chunk.columns]
+        yield chunk, fraction
+
+
+# float32 só quando todos os valores voltam idênticos a float64 (ex.: 1234.56 não volta)
+def _fits_float32(values):
+    v = values.to_numpy(dtype="float64", na_value=np.nan)
+    return bool(np.array_equal(v.astype("float32").astype("float64"), v, equal_nan=True))
+
+
+def _numeric_dtype(col, values):
+    v = values.dropna()
+    if v.empty:
+        return "float32"
+    if any(h in col.lower() for h in COORD_HINTS):
+        return "float64"
+    bound = float(v.abs().max())
+    if (v % 1 == 0).all():
+        # Margem de 8x sobre a amostra; blocos fora do intervalo alargam o tipo
+        if bound < 2 ** 12:
+            return "Int16"
+        if bound < 2 ** 28:
+            return "Int32"
+        return "Int64"
+    return "float32" if _fits_float32(v) else "float64"
+
+
+# Pré-passagem amostral: tipos compactos para cada coluna (e o formato das colunas de data)
+def infer_dtypes(sample):
+    dtypes, formats = {}, {}
+    for col in sample.columns:
+        s = sample[col]
+        name = col.lower()
+        present = int(s.notna().sum())
+        if pd.api.types.is_datetime64_any_dtype(s):
+            dtypes[col] = "datetime64[ns]"
+            continue
+        if pd.api.types.is_bool_dtype(s):
+            dtypes[col] = "category"
+            continue
+        if pd.api.types.is_numeric_dtype(s):
+            dtypes[col] = _numeric_dtype(col, s)
+            continue
+        if present and is_candidate(col):
+            fmt, rate = infer_format(s)
+            # Colunas só de hora ficam como texto; o preprocess_df as combina com a data
+            if fmt is not None and rate == 1.0 and not is_time_format(fmt):
+                dtypes[col] = "datetime64[ns]"
+                formats[col] = fmt
+                continue
+        numeric = pd.to_numeric(s, errors="coerce")
+        if present == 0:
+            dtypes[col] = "string"
+        elif numeric.notna().sum() == present:
+            dtypes[col] = _numeric_dtype(col, numeric)
+        elif any(h in name for h in CATEGORY_HINTS) or s.nunique() <= present // 2:
+            dtypes[col] = "category"
+        else:
+            dtypes[col] = "string"
+    return dtypes, formats
+
+
+def _coerce(chunk, dtypes, formats):
+    out, widen = {}, {}
+    for col, dtype in dtypes.items():
+        s = chunk[col] if col in chunk else pd.Series(None, index=chunk.index, dtype=object)
+        present = s.notna()
+        if dtype in ("category", "string"):
+            out[col] = s.where(~present, s.astype(str)).astype(object)
+            continue
+        if dtype == "datetime64[ns]":
+            if col in formats:
+                values = parse_with_format(s, formats[col])
+            else:
+                values = pd.to_datetime(s, errors="coerce")
+            if (values.isna() & present).any():
+                widen[col] = "string"
+                continue
+            out[col] = values.astype("datetime64[ns]")
+            continue
+        values = s if pd.api.types.is_numeric_dtype(s) else pd.to_numeric(s, errors="coerce")
+        if (values.isna() & present).any():
+            widen[col] = "string"
+            continue
+        if dtype.startswith("Int"):
+            v = values.dropna().astype("float64")
+            info = np.iinfo(dtype.lower())
+            if (v % 1 != 0).any():
+                widen[col] = "float64"
+                continue
+            if len(v) and (v.min() < info.min or v.max() > info.max):
+                widen[col] = {"Int16": "Int32", "Int32": "Int64"}.get(dtype, "float64")
+                continue
+        elif dtype == "float32" and not _fits_float32(values):
+            widen[col] = "float64"
+            continue
+        out[col] = values.astype(dtype)
+    if widen:
+        raise _Widen(widen)
+    return pd.DataFrame(out, index=chunk.index)
+
+
+def _schema(dtypes):
+    categories = [col for col, dtype in dtypes.items() if dtype == "category"]
+    schema = pa.schema([(col, _ARROW_TYPES[dtype]) for col, dtype in dtypes.items()])
+    return schema.with_metadata({_CATEGORIES_KEY: json.dumps(categories).encode("utf-8")})
+
+
+# Alargamentos só numéricos não exigem reler a origem: os blocos já gravados são convertidos no fim
+def _castable(old, new):
+    return old in _NUMERIC_DTYPES and new in _NUMERIC_DTYPES
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Uma passagem pela origem: cada bloco é convertido (alargando os tipos numéricos no próprio bloco,
+# num novo trecho do arquivo) e, se o esquema mudou, os trechos são unificados no esquema final lendo
+# o Parquet já gravado. Só um alargamento para texto, que precisa do valor original, reinicia a leitura
+def _write(path, kind, sheet, target, dtypes, formats, progress, chunk_rows):
+    parts, writer, tmp = [], None, f"{target}.{os.getpid()}.tmp"
+    try:
+        for chunk, fraction in iter_chunks(path, kind, sheet, chunk_rows):
+            while True:
+                try:
+                    frame = _coerce(chunk, dtypes, formats)
+                    break
+                except _Widen as w:
+                    if parts and not all(_castable(dtypes[col], dtype) for col, dtype in w.changes.items()):
+                        raise
+                    dtypes.update(w.changes)
+                    for col in w.changes:
+                        formats.pop(col, None)
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+            if writer is None:
+                schema = _schema(dtypes)
+                parts.append(f"{target}.{os.getpid()}.{len(parts)}.tmp")
+                writer = pq.ParquetWriter(parts[-1], schema)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            if progress is not None:
+                progress(fraction)
+        if writer is None:
+            schema = _schema(dtypes)
+            parts.append(f"{target}.{os.getpid()}.0.tmp")
+            writer = pq.ParquetWriter(parts[-1], schema)
+        writer.close()
+        writer = None
+        if len(parts) == 1:
+            os.replace(parts[0], target)
+            return
+        final = _schema(dtypes)
+        with pq.ParquetWriter(tmp, final) as out:
+            for part in parts:
+                for batch in pq.ParquetFile(part).iter_batches():
+                    out.write_table(pa.Table.from_batches([batch]).cast(final))
+        os.replace(tmp, target)
+    finally:
+        if writer is not None:
+            writer.close()
+        _remove(parts + [tmp])
+
+
+# Converte uma aba/arquivo para Parquet em blocos, alargando tipos quando a amostra não bastou
+def ingest_to_parquet(path, kind, sheet, target, progress=None, chunk_rows=CHUNK_ROWS):
+    chunks = iter_chunks(path, kind, sheet, SAMPLE_ROWS)
+    sample, _ = next(chunks)
+    chunks.close()
+    dtypes, formats = infer_dtypes(sample)
+    del sample
+    while True:
+        try:
+            _write(path, kind, sheet, target, dtypes, formats, progress, chunk_rows)
+            return dtypes
+        except _Widen as w:
+            # Todos os alargamentos do bloco de uma vez, antes de reler a origem
+            dtypes.update(w.changes)
+            for col in w.changes:
+                formats.pop(col, None)
+
+
+def read_parquet(path):
+    metadata = pq.read_schema(path).metadata or {}
+    categories = json.loads(metadata.get(_CATEGORIES_KEY, b"[]").decode("utf-8"))
+    table = pq.read_table(path, memory_map=True, read_dictionary=categories or None)
+    return table.to_pandas(types_mapper=_PANDAS_INTS.get)
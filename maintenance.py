@@ -0,0 +1,155 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Motor de regras de manutenção: status normalizado uma vez por categoria, métricas por equipamento
+# (horímetro atual, status atual, horas desde a última manutenção) calculadas só para os equipamentos
+# cujas linhas mudaram, e regras avaliadas de forma vetorizada sobre uma linha por máquina
+STATUS_HINT = "manut"
+HOURMETER_HINT = "horimet"
+ALERT_STATUSES = ("pendente", "agendar")
+SERVICE_STATUSES = ("sim", "realizada", "concluída", "concluida", "feita")
+ALL_EQUIPMENT = "Todos"
+MEMO_SIZE = 8
+
+EQUIPMENT = "Equipamento"
+HOURMETER = "Horímetro atual"
+STATUS = "Status atual"
+SINCE_SERVICE = "Horas desde a última manutenção"
+SERVICED = "Manutenção registrada"
+LAST_RECORD = "Último registro"
+RECORDS = "Registros"
+FIRED = "Regras disparadas"
+# Chave de DataFrame.attrs com quantos equipamentos foram recalculados na chamada
+RECOMPUTED = "recalculados"
+
+RULE_LABELS = {
+    "horimetro": "Horímetro ≥ {0:g} h",
+    "intervalo": "Sem manutenção há ≥ {0:g} h",
+    "status": "Status em {0}",
+}
+
+
+# Minúsculas e sem espaços nas bordas, aplicado às categorias (não às linhas); rótulos que
+# coincidem após a normalização são unificados remapeando os códigos
+def normalize_status(values):
+    s = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    labels = s.cat.categories.astype(str).str.strip().str.lower()
+    new_codes, uniques = pd.factorize(labels)
+    lut = np.append(new_codes, -1)
+    codes = lut[s.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=values.index, name=values.name)
+
+
+def rule_label(rule):
+    kind, param = rule[0], rule[1]
+    if kind == "status":
+        param = ", ".join(param)
+    return RULE_LABELS[kind].format(param)
+
+
+class RulesEngine:
+    # Compartilhado entre os reruns de uma aba: as métricas de cada equipamento ficam memorizadas junto
+    # com a impressão digital (hash) das suas linhas, e só os equipamentos alterados são recalculados.
+    # A memória guarda os MEMO_SIZE conjuntos de status de serviço usados mais recentemente
+    def __init__(self, hor_col, status_col, equip_col=None, order_col=None):
+        self.hor_col = hor_col
+        self.status_col = status_col
+        self.equip_col = equip_col
+        self.order_col = order_col
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()
+
+    def _frame(self, df):
+        frame = pd.DataFrame({
+            EQUIPMENT: df[self.equip_col].astype(str) if self.equip_col else ALL_EQUIPMENT,
+            "hor": pd.to_numeric(df[self.hor_col], errors="coerce").astype("float64"),
+            "status": normalize_status(df[self.status_col]),
+        }, index=df.index)
+        if self.order_col:
+            frame["ordem"] = df[self.order_col]
+        return frame
+
+    # Métricas por equipamento a partir do histórico ordenado; o incremento do horímetro por
+    # groupby/diff ignora reinícios (trocas de painel) e zera a contagem a cada manutenção
+    def _metrics(self, frame, service):
+        order = [EQUIPMENT, "ordem", "hor"] if "ordem" in frame else [EQUIPMENT, "hor"]
+        frame = frame.sort_values(order, kind="stable")
+        by_equipment = frame.groupby(EQUIPMENT, sort=False)
+        step = by_equipment["hor"].diff().clip(lower=0).fillna(0.0)
+        run = step.groupby(frame[EQUIPMENT], sort=False).cumsum()
+        serviced = frame["status"].isin(service)
+        at_service = run.where(serviced).groupby(frame[EQUIPMENT], sort=False).ffill()
+        since = (run - at_service.fillna(0.0)).groupby(frame[EQUIPMENT], sort=False).last()
+        metrics = pd.DataFrame({
+            HOURMETER: by_equipment["hor"].last(),
+            STATUS: by_equipment["status"].last().astype(object),
+            SINCE_SERVICE: since,
+            SERVICED: serviced.groupby(frame[EQUIPMENT], sort=False).any(),
+            RECORDS: by_equipment.size(),
+        })
+        if "ordem" in frame:
+            metrics[LAST_RECORD] = by_equipment["ordem"].last()
+        return metrics
+
+    # Métricas de todos os equipamentos presentes em df, recalculando apenas os que mudaram;
+    # attrs[RECOMPUTED] diz quantos foram recalculados nesta chamada
+    def metrics(self, df, service=SERVICE_STATUSES):
+        frame = self._frame(df)
+        service = tuple(sorted(service))
+        fingerprint = pd.Series(
+            pd.util.hash_pandas_object(frame, index=False).to_numpy(), index=frame.index
+        ).groupby(frame[EQUIPMENT], sort=False).sum()
+        with self._lock:
+            known = self._memo.get(service)
+            stale = fingerprint.index
+            if known is not None:
+                self._memo.move_to_end(service)
+                common = fingerprint.index.intersection(known.index)
+                same = known.loc[common, "_hash"].to_numpy(dtype="uint64") == fingerprint.loc[common].to_numpy()
+                stale = fingerprint.index.difference(common[same])
+            if len(stale) or known is None:
+                fresh = self._metrics(frame[frame[EQUIPMENT].isin(stale)], service)
+                fresh["_hash"] = fingerprint.reindex(fresh.index)
+                kept = known.drop(fresh.index, errors="ignore") if known is not None else fresh.iloc[0:0]
+                # Blocos vazios ficam fora do concat (o dtype do resultado não depende deles)
+                parts = [part for part in (kept, fresh) if not part.empty]
+                known = pd.concat(parts) if len(parts) > 1 else (parts[0] if parts else fresh)
+                self._memo[service] = known
+                while len(self._memo) > MEMO_SIZE:
+                    self._memo.popitem(last=False)
+            table = known.reindex(fingerprint.index).drop(columns="_hash")
+        table.attrs[RECOMPUTED] = len(stale)
+        return table
+
+    # Avalia as regras sobre as métricas dos equipamentos presentes em df (ver apply_rules)
+    def evaluate(self, df, rules, service=SERVICE_STATUSES, combine="todas"):
+        return apply_rules(self.metrics(df, service), rules, combine)
+
+
+# Avalia as regras sobre uma linha por equipamento (métricas do RulesEngine ou calculadas na base
+# consolidada); combine="todas" (E) ou "qualquer" (OU).
+# Regras: ("horimetro", limite), ("intervalo", horas), ("status", (status, ...))
+def apply_rules(table, rules, combine="todas"):
+    attrs = dict(table.attrs)
+    fired = {}
+    for rule in rules:
+        kind, param = rule[0], rule[1]
+        if kind == "horimetro":
+            fired[rule] = (table[HOURMETER] >= param).to_numpy()
+        elif kind == "intervalo":
+            fired[rule] = (table[SINCE_SERVICE] >= param).to_numpy()
+        else:
+            fired[rule] = table[STATUS].isin(param).to_numpy()
+    table = table.reset_index()
+    table.attrs.update(attrs)
+    if not fired:
+        return table.iloc[0:0], table
+    hits = np.column_stack(list(fired.values()))
+    alert = hits.all(axis=1) if combine == "todas" else hits.any(axis=1)
+    labels = np.array([rule_label(rule) for rule in fired], dtype=object)
+    table[FIRED] = ["; ".join(labels[row]) for row in hits]
+    alerts = table[alert].sort_values(HOURMETER, ascending=False, na_position="last")
+    return alerts.reset_index(drop=True), table
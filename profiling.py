@@ -0,0 +1,184 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Instrumentação opcional de cada rerun do app: intervalos de tempo (spans) aninhados, acertos e
+# falhas de cache com o tempo gasto fora da função (hash, busca, (de)serialização) e o tamanho do que
+# é enviado ao navegador. Desligada, cada ponto de medição custa apenas uma consulta ao thread-local.
+# ANALYZER_PROFILE=1 liga por padrão; ANALYZER_PROFILE_FILE grava cada rerun em JSONL (.jsonl)
+# ou os totais acumulados do processo no formato OpenMetrics (.prom/.txt)
+PROFILE_ENV = "ANALYZER_PROFILE"
+PROFILE_FILE_ENV = "ANALYZER_PROFILE_FILE"
+
+_local = threading.local()
+_totals_lock = threading.Lock()
+_totals = {
+    "reruns": 0,
+    "spans": defaultdict(lambda: [0, 0.0]),
+    "cache": defaultdict(lambda: {"hit": 0, "miss": 0, "overhead": 0.0}),
+    "payload": defaultdict(lambda: [0, 0]),
+}
+
+
+class RerunProfile:
+    def __init__(self):
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.depth = 0
+        self.spans = []
+        self.cache = []
+        self.payloads = []
+        self.total = None
+
+    def offset(self):
+        return time.perf_counter() - self._t0
+
+
+def default_enabled():
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0", "false")
+
+
+def start_rerun(enabled):
+    _local.profile = RerunProfile() if enabled else None
+    return _local.profile
+
+
+def current():
+    return getattr(_local, "profile", None)
+
+
+@contextmanager
+def span(name):
+    profile = current()
+    if profile is None:
+        yield
+        return
+    start = profile.offset()
+    profile.depth += 1
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        profile.spans.append({"span": name, "nivel": profile.depth, "inicio": start,
+                              "segundos": profile.offset() - start})
+
+
+def record_payload(name, nbytes, kind="dados"):
+    profile = current()
+    if profile is not None:
+        profile.payloads.append({"elemento": name, "tipo": kind, "bytes": int(nbytes)})
+
+
+# Envolve um decorador de cache (ex.: st.cache_data): a função original só roda numa falha, então o
+# tempo da chamada menos o tempo da função é o custo do próprio cache (hash dos argumentos e cópia)
+def instrument_cache(cache_decorator, **cache_kwargs):
+    def decorate(func):
+        state = threading.local()
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            state.miss = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                state.compute = time.perf_counter() - start
+
+        cached = cache_decorator(**cache_kwargs)(compute) if cache_kwargs else cache_decorator(compute)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            profile = current()
+            if profile is None:
+                return cached(*args, **kwargs)
+            state.miss, state.compute = False, 0.0
+            start = time.perf_counter()
+            result = cached(*args, **kwargs)
+            total = time.perf_counter() - start
+            profile.cache.append({"funcao": func.__name__, "resultado": "miss" if state.miss else "hit",
+                                  "segundos": total, "sobrecarga": total - state.compute})
+            return result
+
+        call.clear = getattr(cached, "clear", None)
+        return call
+
+    return decorate
+
+
+def _accumulate(profile):
+    with _totals_lock:
+        _totals["reruns"] += 1
+        for item in profile.spans:
+            entry = _totals["spans"][item["span"]]
+            entry[0] += 1
+            entry[1] += item["segundos"]
+        for item in profile.cache:
+            entry = _totals["cache"][item["funcao"]]
+            entry[item["resultado"]] += 1
+            entry["overhead"] += item["sobrecarga"]
+        for item in profile.payloads:
+            entry = _totals["payload"][item["elemento"]]
+            entry[0] += 1
+            entry[1] += item["bytes"]
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Totais acumulados do processo no formato de exposição OpenMetrics
+def openmetrics():
+    lines = ["# TYPE analyzer_reruns counter", f"analyzer_reruns_total {_totals['reruns']}",
+             "# TYPE analyzer_span_seconds counter", "# UNIT analyzer_span_seconds seconds"]
+    with _totals_lock:
+        spans = dict(_totals["spans"])
+        cache = dict(_totals["cache"])
+        payload = dict(_totals["payload"])
+    lines += [f'analyzer_span_seconds_total{{span="{_label(name)}"}} {seconds:.6f}' for name, (_, seconds) in spans.items()]
+    lines.append("# TYPE analyzer_span_calls counter")
+    lines += [f'analyzer_span_calls_total{{span="{_label(name)}"}} {count}' for name, (count, _) in spans.items()]
+    lines.append("# TYPE analyzer_cache_requests counter")
+    for name, entry in cache.items():
+        for result in ("hit", "miss"):
+            lines.append(f'analyzer_cache_requests_total{{function="{_label(name)}",result="{result}"}} {entry[result]}')
+    lines += ["# TYPE analyzer_cache_overhead_seconds counter", "# UNIT analyzer_cache_overhead_seconds seconds"]
+    lines += [f'analyzer_cache_overhead_seconds_total{{function="{_label(name)}"}} {entry["overhead"]:.6f}'
+              for name, entry in cache.items()]
+    lines += ["# TYPE analyzer_payload_bytes counter", "# UNIT analyzer_payload_bytes bytes"]
+    lines += [f'analyzer_payload_bytes_total{{element="{_label(name)}"}} {nbytes}' for name, (_, nbytes) in payload.items()]
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _write(profile, path):
+    if path.endswith(".jsonl"):
+        record = {"inicio": profile.started, "segundos": profile.total, "spans": profile.spans,
+                  "cache": profile.cache, "payloads": profile.payloads}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(openmetrics())
+        os.replace(tmp, path)
+
+
+# Encerra o rerun: acumula os totais do processo e grava no arquivo configurado
+def finish_rerun(path=None):
+    profile = current()
+    if profile is None:
+        return None
+    profile.total = profile.offset()
+    _accumulate(profile)
+    path = path or os.environ.get(PROFILE_FILE_ENV)
+    if path:
+        try:
+            _write(profile, path)
+        except OSError:
+            pass
+    _local.profile = None
+    return profile
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from datetimes import detect_datetimes
+from ingest import file_kind, ingest_to_parquet, list_sheets, read_parquet
+
+# Cache colunar em disco das planilhas enviadas (chave = hash do conteúdo do arquivo)
+CACHE_DIR = os.environ.get(
+    "ANALYZER_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+# Limite do cache de planilhas; acima dele as menos usadas recentemente são removidas
+CACHE_MAX_BYTES = int(os.environ.get("ANALYZER_CACHE_MAX_BYTES", 4 * 1024 ** 3))
+
+_lock = threading.Lock()
+_sheet_locks = {}
+_workers = {}
+_progress = {}
+
+
+def workbook_dir(file_hash):
+    return os.path.join(CACHE_DIR, "workbooks", file_hash)
+
+
+def workbook_cached(file_hash):
+    return os.path.exists(_manifest_path(file_hash))
+
+
+def _source_path(file_hash, kind):
+    return os.path.join(workbook_dir(file_hash), f"source.{kind}")
+
+
+def _manifest_path(file_hash):
+    return os.path.join(workbook_dir(file_hash), "manifest.json")
+
+
+def sheet_path(file_hash, index):
+    return os.path.join(workbook_dir(file_hash), f"sheet_{index}.parquet")
+
+
+def _sheet_lock(path):
+    with _lock:
+        return _sheet_locks.setdefault(path, threading.Lock())
+
+
+def _atomic_write(path, data, mode="wb"):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, mode) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_manifest(file_hash):
+    with open(_manifest_path(file_hash), encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.setdefault("kind", "xlsx")
+    return manifest
+
+
+# Registra o arquivo: grava a origem uma única vez e converte as abas em segundo plano
+def register_workbook(data, name="planilha.xlsx"):
+    file_hash = hashlib.sha256(data).hexdigest()
+    if not os.path.exists(_manifest_path(file_hash)):
+        kind = file_kind(name)
+        os.makedirs(workbook_dir(file_hash), exist_ok=True)
+        _atomic_write(_source_path(file_hash, kind), data)
+        manifest = {"name": name, "kind": kind, "sheets": list_sheets(_source_path(file_hash, kind), kind, name)}
+        _atomic_write(_manifest_path(file_hash), json.dumps(manifest, ensure_ascii=False), mode="w")
+    manifest = read_manifest(file_hash)
+    _touch(file_hash)
+    _start_background(file_hash, manifest)
+    prune_workbooks(keep=(file_hash,))
+    return file_hash, manifest["sheets"]
+
+
+# A data de modificação da pasta marca o último uso da planilha
+def _touch(file_hash):
+    try:
+        os.utime(workbook_dir(file_hash))
+    except OSError:
+        pass
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+# Planilha em uso: conversão em segundo plano ou alguma aba sendo convertida agora
+def _busy(file_hash):
+    worker = _workers.get(file_hash)
+    if worker is not None and worker.is_alive():
+        return True
+    prefix = workbook_dir(file_hash) + os.sep
+    return any(path.startswith(prefix) and lock.locked() for path, lock in _sheet_locks.items())
+
+
+# Remove as planilhas usadas há mais tempo até o cache caber em max_bytes
+def prune_workbooks(max_bytes=None, keep=()):
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = os.path.join(CACHE_DIR, "workbooks")
+    try:
+        entries = [entry for entry in os.scandir(root) if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+    sizes = {entry.name: _dir_size(entry.path) for entry in entries}
+    total = sum(sizes.values())
+    removed = []
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        with _lock:
+            if entry.name in keep or _busy(entry.name):
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+        total -= sizes[entry.name]
+        removed.append(entry.name)
+    return removed
+
+
+def _start_background(file_hash, manifest):
+    pending = [i for i in range(len(manifest["sheets"])) if not os.path.exists(sheet_path(file_hash, i))]
+    if not pending:
+        return
+    with _lock:
+        worker = _workers.get(file_hash)
+        if worker is not None and worker.is_alive():
+            return
+        worker = threading.Thread(target=_convert_all, args=(file_hash, manifest, pending), daemon=True)
+        _workers[file_hash] = worker
+        worker.start()
+
+
+# Aguarda a conversão em segundo plano do arquivo (usado para medir a ingestão de forma síncrona)
+def wait_for_conversion(file_hash):
+    with _lock:
+        worker = _workers.get(file_hash)
+    if worker is not None:
+        worker.join()
+
+
+def _convert_all(file_hash, manifest, pending):
+    for index in pending:
+        try:
+            _convert_sheet(file_hash, manifest, index)
+        except Exception:
+            # A aba é convertida de novo (e o erro exibido) quando for selecionada
+            pass
+
+
+def _convert_sheet(file_hash, manifest, index, progress=None):
+    path = sheet_path(file_hash, index)
+    lock = _sheet_lock(path)
+    # Se outra thread já está convertendo esta aba, acompanha o progresso dela
+    while not lock.acquire(timeout=0.25):
+        if progress is not None:
+            progress(_progress.get(path))
+    try:
+        if not os.path.exists(path):
+            def report(fraction):
+                _progress[path] = fraction
+                if progress is not None:
+                    progress(fraction)
+
+            kind = manifest["kind"]
+            ingest_to_parquet(_source_path(file_hash, kind), kind, manifest["sheets"][index], path, report)
+    finally:
+        _progress.pop(path, None)
+        lock.release()
+    return path
+
+
+# Carrega apenas a aba selecionada (do Parquet, se já convertida)
+def load_sheet(file_hash, sheet, progress=None):
+    manifest = read_manifest(file_hash)
+    _touch(file_hash)
+    path = sheet_path(file_hash, manifest["sheets"].index(sheet))
+    if not os.path.exists(path):
+        _convert_sheet(file_hash, manifest, manifest["sheets"].index(sheet), progress)
+    return read_parquet(path)
+
+
+# Aba pronta para análise: carregada e com as datas detectadas; devolve (df, relatório das datas)
+def prepare_sheet(file_hash, sheet, progress=None):
+    return detect_datetimes(load_sheet(file_hash, sheet, progress))
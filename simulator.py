@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import ROWS_COL, has_metric, metric_stat
+
+# Simulador Monte Carlo: cada sorteio é uma operação, tirada da mistura das distribuições ajustadas
+# por operador/equipamento a partir do cubo (média e desvio via soma e soma dos quadrados).
+# Velocidade, consumo e área são estritamente positivas: lognormal com a mesma média e desvio.
+# A eficiência é uma normal truncada em (0, 100]: valores fora do intervalo são sorteados de novo.
+# Os sliders escalam velocidade, consumo e área pela razão alvo/média e deslocam a eficiência.
+SIM_METRICS = {
+    "velocidade": "Velocidade Média Efetiva (km/h)",
+    "eficiencia": "Eficiência de Motor (%)",
+    "consumo": "Consumo Médio (l/ha)",
+    "area": "Área Operacional (ha)",
+}
+RENDIMENTO = "Rendimento Operacional (ha/h)"
+N_DRAWS = 100_000
+PERCENTILES = (5, 50, 95)
+TORNADO_STEP = 0.10
+BLOCK_SCENARIOS = 16
+
+OUTPUTS = {
+    "consumo_total": "Consumo por operação (l)",
+    "economia": "Economia por operação (l)",
+    "horas": "Horas por operação (h)",
+}
+# Parâmetros variados na grade de cenários de cada saída
+GRID_AXES = {"consumo_total": ("consumo", "area"), "economia": ("consumo", "area"), "horas": ("velocidade", "eficiencia")}
+_TRUNCATED = {"eficiencia": (0.1, 100.0)}
+MAX_REDRAWS = 20
+
+
+def fit_distributions(cube, group=None):
+    names = [name for name, col in SIM_METRICS.items() if has_metric(cube, col)]
+    if group:
+        weights = cube.groupby(group, observed=True)[ROWS_COL].sum()
+        means = pd.DataFrame({name: metric_stat(cube, SIM_METRICS[name], "mean", by=group) for name in names})
+        stds = pd.DataFrame({name: metric_stat(cube, SIM_METRICS[name], "std", by=group) for name in names})
+        means, stds = means.reindex(weights.index), stds.reindex(weights.index)
+    else:
+        weights = pd.Series([cube[ROWS_COL].sum()])
+        means = pd.DataFrame([{name: metric_stat(cube, SIM_METRICS[name], "mean") for name in names}])
+        stds = pd.DataFrame([{name: metric_stat(cube, SIM_METRICS[name], "std") for name in names}])
+    overall = {name: metric_stat(cube, SIM_METRICS[name], "mean") for name in names}
+    means = means.fillna(overall)
+    keep = (weights.to_numpy() > 0) & means.notna().all(axis=1).to_numpy()
+    capacity = None
+    # Capacidade calibrada: rendimento (ha/h) = k · velocidade · eficiência / 100
+    if has_metric(cube, RENDIMENTO) and "velocidade" in overall and "eficiencia" in overall:
+        denom = overall["velocidade"] * overall["eficiencia"] / 100
+        capacity = metric_stat(cube, RENDIMENTO, "mean") / denom if denom else None
+    return {
+        "names": names,
+        "groups": list(weights.index[keep]),
+        "weights": weights.to_numpy(dtype="float64")[keep],
+        "mean": means.to_numpy(dtype="float64")[keep],
+        "std": stds.fillna(0.0).to_numpy(dtype="float64")[keep],
+        "overall": overall,
+        "area_total": metric_stat(cube, SIM_METRICS["area"], "sum") if "area" in names else None,
+        "capacity": capacity if capacity and np.isfinite(capacity) else None,
+    }
+
+
+# Lognormal com média e desvio dados (momentos casados); grupos sem média positiva ficam em zero
+def _lognormal(mean, std, z):
+    positive = mean > 0
+    safe_mean = np.where(positive, mean, 1.0)
+    sigma2 = np.log1p(np.square(std / safe_mean))
+    mu = np.log(safe_mean) - sigma2 / 2
+    return np.where(positive, np.exp(mu + np.sqrt(sigma2) * z), 0.0)
+
+
+# Normal truncada por rejeição; o que ainda cair fora após MAX_REDRAWS fica na média do grupo
+def _truncated(mean, std, low, high, rng):
+    values = mean + std * rng.standard_normal(mean.shape)
+    for _ in range(MAX_REDRAWS):
+        out = (values < low) | (values > high)
+        if not out.any():
+            return values
+        values[out] = mean[out] + std[out] * rng.standard_normal(int(out.sum()))
+    out = (values < low) | (values > high)
+    values[out] = np.clip(mean[out], low, high)
+    return values
+
+
+def draw(fit, n=N_DRAWS, seed=0):
+    if not len(fit["weights"]):
+        return {}
+    rng = np.random.default_rng(seed)
+    groups = rng.choice(len(fit["weights"]), size=n, p=fit["weights"] / fit["weights"].sum())
+    mean, std = fit["mean"][groups], fit["std"][groups]
+    z = rng.standard_normal((n, len(fit["names"])))
+    draws = {}
+    for i, name in enumerate(fit["names"]):
+        if name in _TRUNCATED:
+            draws[name] = _truncated(mean[:, i], std[:, i], *_TRUNCATED[name], rng)
+        else:
+            draws[name] = _lognormal(mean[:, i], std[:, i], z[:, i])
+    return draws
+
+
+# Saídas por operação para um bloco de cenários; targets: nome -> array (S, 1) ou escalar
+def _outputs(fit, draws, targets):
+    scenario = {}
+    for name, values in draws.items():
+        target = targets.get(name)
+        if target is None:
+            scenario[name] = values
+        elif name == "area":
+            scenario[name] = values * (np.asarray(target) / fit["area_total"] if fit["area_total"] else 1.0)
+        elif name in _TRUNCATED:
+            # Eficiência deslocada pela diferença do alvo, limitada ao intervalo físico
+            scenario[name] = np.clip(values + (np.asarray(target) - fit["overall"][name]), *_TRUNCATED[name])
+        else:
+            overall = fit["overall"][name]
+            scenario[name] = values * (np.asarray(target) / overall if overall else 1.0)
+    out = {}
+    if "consumo" in draws and "area" in draws:
+        out["consumo_total"] = scenario["consumo"] * scenario["area"]
+        out["economia"] = draws["consumo"] * draws["area"] - out["consumo_total"]
+    if fit["capacity"] and {"velocidade", "eficiencia", "area"} <= set(draws):
+        out["horas"] = scenario["area"] / (fit["capacity"] * scenario["velocidade"] * scenario["eficiencia"] / 100)
+    return out
+
+
+# Intervalos de confiança do cenário (e da base) por saída
+def simulate(fit, draws, targets):
+    base = _outputs(fit, draws, {})
+    scenario = _outputs(fit, draws, targets)
+    rows = []
+    for key, label in OUTPUTS.items():
+        if key not in scenario:
+            continue
+        row = {"Saída": label}
+        for prefix, values in (("Real", base[key]), ("Simulado", scenario[key])):
+            if key == "economia" and prefix == "Real":
+                continue
+            row[f"{prefix} (média)"] = float(values.mean())
+            for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                row[f"{prefix} P{p}"] = float(v)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# Avalia em lote a média de uma saída para S cenários (targets: nome -> array (S,))
+def batch_means(fit, draws, targets, output):
+    size = len(next(iter(targets.values())))
+    result = np.empty(size)
+    for start in range(0, size, BLOCK_SCENARIOS):
+        block = {name: np.asarray(values[start:start + BLOCK_SCENARIOS], dtype="float64")[:, None]
+                 for name, values in targets.items()}
+        values = _outputs(fit, draws, block)[output]
+        rows = len(next(iter(block.values())))
+        result[start:start + BLOCK_SCENARIOS] = np.broadcast_to(values, (rows, values.shape[-1])).mean(axis=1)
+    return result
+
+
+# Sensibilidade (tornado): variação da média da saída com cada parâmetro a ±10% do cenário, demais fixos
+def tornado(fit, draws, targets, output):
+    names = [name for name in targets if name in draws]
+    batch = {name: [targets[name]] for name in names}
+    for varied in names:
+        for factor in (1 - TORNADO_STEP, 1 + TORNADO_STEP):
+            for name in names:
+                batch[name].append(targets[name] * factor if name == varied else targets[name])
+    means = batch_means(fit, draws, batch, output)
+    center, swings = means[0], means[1:].reshape(len(names), 2) - means[0]
+    frame = pd.DataFrame({
+        "Parâmetro": [SIM_METRICS[name] for name in names],
+        "-10%": swings[:, 0],
+        "+10%": swings[:, 1],
+    })
+    frame["Amplitude"] = (frame["+10%"] - frame["-10%"]).abs()
+    frame.attrs["centro"] = float(center)
+    return frame.sort_values("Amplitude", ascending=True)
+
+
+# Grade de cenários (dois parâmetros variando) avaliada numa única chamada
+def scenario_grid(fit, draws, targets, x_name, x_values, y_name, y_values, output):
+    xx, yy = np.meshgrid(np.asarray(x_values, dtype="float64"), np.asarray(y_values, dtype="float64"))
+    batch = {name: np.full(xx.size, value, dtype="float64") for name, value in targets.items() if name in draws}
+    batch[x_name] = xx.ravel()
+    batch[y_name] = yy.ravel()
+    return batch_means(fit, draws, batch, output).reshape(xx.shape)
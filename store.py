@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import threading
+
+from aggregates import DAY_COL, ROWS_COL
+from filters import effective_predicates
+from indicators import IndicatorError
+from maintenance import (ALL_EQUIPMENT, EQUIPMENT, HOURMETER, LAST_RECORD, RECOMPUTED, RECORDS, SERVICE_STATUSES,
+                         SERVICED, SINCE_SERVICE, STATUS)
+from sheet_cache import CACHE_DIR
+
+# Base consolidada: banco DuckDB embutido e compartilhado por todas as sessões. Cada aba anexada
+# entra na tabela do seu esquema (abas com as mesmas colunas são unidas); filtros, KPIs e
+# agregações rodam como SQL, com varredura fora da memória quando os dados excedem a RAM
+STORE_PATH = os.path.join(CACHE_DIR, "consolidada.duckdb")
+SOURCE_FILE_COL = "Arquivo de origem"
+SOURCE_SHEET_COL = "Aba de origem"
+SAMPLE_ROWS = 200_000
+BATCH_VECTORS = 24
+
+_NUMERIC_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                  "UINTEGER", "UBIGINT", "FLOAT", "REAL", "DOUBLE", "DECIMAL")
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# Tipos normalizados para a união entre arquivos (ex.: Int16 numa aba e Int32 noutra)
+def _normalized_type(sql_type):
+    sql_type = sql_type.upper()
+    if sql_type.startswith(_NUMERIC_TYPES):
+        return "DOUBLE"
+    if sql_type.startswith(("TIMESTAMP", "DATE")):
+        return "TIMESTAMP"
+    if sql_type == "BOOLEAN" or sql_type.startswith("INTERVAL"):
+        return sql_type
+    return "VARCHAR"
+
+
+def _schema_table(schema):
+    signature = json.dumps(sorted(schema), ensure_ascii=False)
+    return f"dados_{hashlib.sha256(signature.encode('utf-8')).hexdigest()[:12]}"
+
+
+class AnalyticalStore:
+    def __init__(self, path=STORE_PATH):
+        import duckdb
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._con = duckdb.connect(path, config={"temp_directory": os.path.join(CACHE_DIR, "duckdb_tmp")})
+        self._lock = threading.Lock()
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS fontes (
+                fonte VARCHAR PRIMARY KEY, tabela VARCHAR, arquivo VARCHAR, aba VARCHAR,
+                linhas BIGINT, adicionado TIMESTAMP DEFAULT current_timestamp
+            )
+        """)
+
+    # Cada consulta usa o seu cursor (conexão duplicada), seguro entre as threads das sessões
+    def cursor(self):
+        return self._con.cursor()
+
+    def version(self):
+        return tuple(self.cursor().execute(
+            "SELECT COUNT(*), CAST(MAX(adicionado) AS VARCHAR) FROM fontes"
+        ).fetchone())
+
+    def tables(self):
+        return self.cursor().execute("""
+            SELECT tabela, COUNT(*) AS abas, SUM(linhas) AS linhas FROM fontes
+            GROUP BY tabela ORDER BY MIN(adicionado)
+        """).fetchdf()
+
+    def sources(self, table):
+        return self.cursor().execute(
+            "SELECT fonte, arquivo, aba, linhas, adicionado FROM fontes WHERE tabela = ? ORDER BY adicionado",
+            [table],
+        ).fetchdf()
+
+    def has_source(self, file_hash, sheet):
+        return self.cursor().execute(
+            "SELECT COUNT(*) FROM fontes WHERE fonte = ?", [f"{file_hash}:{sheet}"]
+        ).fetchone()[0] > 0
+
+    # Anexa uma aba já processada; reenviar o mesmo arquivo não duplica linhas
+    def append(self, df, file_hash, file_name, sheet):
+        fonte = f"{file_hash}:{sheet}"
+        cur = self.cursor()
+        cur.register("_entrada", df)
+        try:
+            described = cur.execute("DESCRIBE SELECT * FROM _entrada").fetchall()
+            schema = [(str(name), _normalized_type(sql_type)) for name, sql_type, *_ in described
+                      if name not in (SOURCE_FILE_COL, SOURCE_SHEET_COL)]
+            table = _schema_table(schema)
+            with self._lock:
+                if self.has_source(file_hash, sheet):
+                    return table
+                columns = ", ".join(f"{quote(name)} {sql_type}" for name, sql_type in schema)
+                selected = ", ".join(f"CAST({quote(name)} AS {sql_type})" for name, sql_type in schema)
+                cur.execute("BEGIN TRANSACTION")
+                try:
+                    cur.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {quote(table)} (
+                            {columns}, {quote(SOURCE_FILE_COL)} VARCHAR, {quote(SOURCE_SHEET_COL)} VARCHAR, _fonte VARCHAR
+                        )
+                    """)
+                    cur.execute(
+                        f"INSERT INTO {quote(table)} ({', '.join(quote(name) for name, _ in schema)}, "
+                        f"{quote(SOURCE_FILE_COL)}, {quote(SOURCE_SHEET_COL)}, _fonte) "
+                        f"SELECT {selected}, ?, ?, ? FROM _entrada",
+                        [file_name, sheet, fonte],
+                    )
+                    cur.execute(
+                        "INSERT INTO fontes (fonte, tabela, arquivo, aba, linhas) VALUES (?, ?, ?, ?, ?)",
+                        [fonte, table, file_name, sheet, len(df)],
+                    )
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+            return table
+        finally:
+            cur.unregister("_entrada")
+
+    def remove(self, fonte):
+        cur = self.cursor()
+        with self._lock:
+            row = cur.execute("SELECT tabela FROM fontes WHERE fonte = ?", [fonte]).fetchone()
+            if row is None:
+                return
+            cur.execute("BEGIN TRANSACTION")
+            cur.execute(f"DELETE FROM {quote(row[0])} WHERE _fonte = ?", [fonte])
+            cur.execute("DELETE FROM fontes WHERE fonte = ?", [fonte])
+            cur.execute("COMMIT")
+
+
+class StoreView:
+    # Seleção de abas de uma tabela da base, com os indicadores customizados como colunas calculadas;
+    # expõe values/bounds/predicates como o FilterEngine, mas resolvidos por SQL
+    def __init__(self, store, table, sources, indicators=()):
+        self._store = store
+        self._lock = threading.Lock()
+        self._values = {}
+        self._bounds = {}
+        extra = "".join(f", {sql} AS {quote(name)}" for name, sql in indicators)
+        selected = ", ".join(_literal(fonte) for fonte in sources) or "NULL"
+        self._relation = (f"(SELECT * EXCLUDE (_fonte){extra} FROM {quote(table)} "
+                          f"WHERE _fonte IN ({selected})) AS base")
+        described = self._execute(f"DESCRIBE SELECT * FROM {self._relation}").fetchall()
+        self.types = {name: sql_type.upper() for name, sql_type, *_ in described}
+
+    def _execute(self, sql, params=()):
+        return self._store.cursor().execute(sql, list(params))
+
+    def _columns(self, *prefixes):
+        return [name for name, sql_type in self.types.items() if sql_type.startswith(prefixes)]
+
+    @property
+    def cat_cols(self):
+        return self._columns("VARCHAR", "BOOLEAN")
+
+    @property
+    def num_cols(self):
+        return self._columns("DOUBLE")
+
+    @property
+    def date_cols(self):
+        return self._columns("TIMESTAMP")
+
+    def values(self, col):
+        with self._lock:
+            if col not in self._values:
+                rows = self._execute(
+                    f"SELECT DISTINCT {quote(col)} FROM {self._relation} WHERE {quote(col)} IS NOT NULL ORDER BY 1"
+                ).fetchall()
+                self._values[col] = [row[0] for row in rows]
+            return self._values[col]
+
+    def bounds(self, col):
+        with self._lock:
+            if col not in self._bounds:
+                self._bounds[col] = tuple(self._execute(
+                    f"SELECT MIN({quote(col)}), MAX({quote(col)}) FROM {self._relation}"
+                ).fetchone())
+            return self._bounds[col]
+
+    def predicates(self, cat_filters, num_filters, date_col=None, date_range=None):
+        return effective_predicates(self, cat_filters, num_filters, date_col, date_range)
+
+    @staticmethod
+    def _where(predicates):
+        clauses, params = [], []
+        for key in predicates:
+            kind, col = key[0], quote(key[1])
+            if kind == "cat":
+                clauses.append(f"{col} IN ({', '.join('?' for _ in key[2])})")
+                params += list(key[2])
+            elif kind == "date":
+                clauses.append(f"{col} BETWEEN CAST(? AS TIMESTAMP) AND CAST(? AS TIMESTAMP)")
+                params += [key[2], key[3]]
+            else:
+                clauses.append(f"{col} BETWEEN ? AND ?")
+                params += [key[2], key[3]]
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    # Calcula uma expressão sobre todas as linhas da seleção; falhas da consulta viram IndicatorError
+    def check_expression(self, sql):
+        import duckdb
+        try:
+            self._execute(f"SELECT COUNT(v) FROM (SELECT {sql} AS v FROM {self._relation})").fetchone()
+        except duckdb.Error as e:
+            raise IndicatorError(f"Falha ao calcular o indicador: {e}") from None
+
+    def count(self, predicates=()):
+        where, params = self._where(predicates)
+        return int(self._execute(f"SELECT COUNT(*) FROM {self._relation}{where}", params).fetchone()[0])
+
+    # Cubo no mesmo formato do aggregates.build_cube, calculado por GROUP BY no banco
+    def cube(self, predicates, keys, metrics, date_col=None):
+        groups = [quote(key) for key in keys]
+        if date_col:
+            groups.append(f"date_trunc('day', {quote(date_col)}) AS {quote(DAY_COL)}")
+        select = groups or ["CAST(0 AS TINYINT) AS _todos"]
+        select = select + [f"COUNT(*) AS {quote(ROWS_COL)}"]
+        for metric in metrics:
+            value = f"CAST({quote(metric)} AS DOUBLE)"
+            select += [
+                f"COALESCE(SUM({value}), 0) AS {quote(metric + '|sum')}",
+                f"COUNT({value}) AS {quote(metric + '|count')}",
+                f"MIN({value}) AS {quote(metric + '|min')}",
+                f"MAX({value}) AS {quote(metric + '|max')}",
+                f"COALESCE(SUM({value} * {value}), 0) AS {quote(metric + '|sumsq')}",
+            ]
+        where, params = self._where(predicates)
+        group_by = " GROUP BY ALL" if groups else ""
+        return self._execute(f"SELECT {', '.join(select)} FROM {self._relation}{where}{group_by}", params).fetchdf()
+
+    # Métricas por equipamento no formato do RulesEngine.metrics, sobre todas as linhas filtradas: o
+    # incremento do horímetro (lag) acumulado por equipamento e zerado na última manutenção
+    def equipment_metrics(self, predicates, hor_col, status_col, equip_col=None, order_col=None,
+                          service=SERVICE_STATUSES):
+        where, params = self._where(predicates)
+        equipment = f"CAST({quote(equip_col)} AS VARCHAR)" if equip_col else _literal(ALL_EQUIPMENT)
+        ordem = f", {quote(order_col)} AS ordem" if order_col else ""
+        order = ("ordem ASC NULLS LAST, " if order_col else "") + "hor ASC NULLS LAST"
+        last_record = f", arg_max(ordem, posicao) AS {quote(LAST_RECORD)}" if order_col else ""
+        service = list(service)
+        serviced = ", ".join("?" for _ in service) or "NULL"
+        sql = f"""
+            WITH base AS (
+                SELECT {equipment} AS equipamento, TRY_CAST({quote(hor_col)} AS DOUBLE) AS hor,
+                       lower(trim(CAST({quote(status_col)} AS VARCHAR))) AS status{ordem}
+                FROM {self._relation}{where}
+            ), passos AS (
+                SELECT *, row_number() OVER w AS posicao,
+                       GREATEST(COALESCE(hor - lag(hor) OVER w, 0), 0) AS passo
+                FROM base WINDOW w AS (PARTITION BY equipamento ORDER BY {order})
+            ), acumulado AS (
+                SELECT *, SUM(passo) OVER (PARTITION BY equipamento ORDER BY posicao ROWS UNBOUNDED PRECEDING) AS corrido,
+                       COALESCE(status IN ({serviced}), false) AS servico
+                FROM passos
+            )
+            SELECT equipamento AS {quote(EQUIPMENT)},
+                   arg_max(hor, posicao) AS {quote(HOURMETER)},
+                   arg_max(status, posicao) AS {quote(STATUS)},
+                   arg_max(corrido, posicao) - COALESCE(MAX(corrido) FILTER (WHERE servico), 0) AS {quote(SINCE_SERVICE)},
+                   bool_or(servico) AS {quote(SERVICED)},
+                   COUNT(*) AS {quote(RECORDS)}{last_record}
+            FROM acumulado GROUP BY equipamento
+        """
+        table = self._execute(sql, params + service).fetchdf().set_index(EQUIPMENT)
+        table.attrs[RECOMPUTED] = len(table)
+        return table
+
+    # Contagem dos status (normalizados como em maintenance.normalize_status) nas linhas filtradas
+    def status_counts(self, predicates, col):
+        where, params = self._where(predicates)
+        counts = self._execute(
+            f"SELECT lower(trim(CAST({quote(col)} AS VARCHAR))) AS status, COUNT(*) AS linhas "
+            f"FROM {self._relation}{where} GROUP BY 1 ORDER BY 1", params
+        ).fetchdf()
+        return counts.dropna(subset=["status"]).set_index("status")["linhas"]
+
+    # Amostra uniforme (reservatório) das linhas filtradas para as abas que exibem linhas
+    def sample(self, predicates=(), rows=SAMPLE_ROWS, seed=0):
+        where, params = self._where(predicates)
+        sql = (f"SELECT * FROM (SELECT * FROM {self._relation}{where}) "
+               f"USING SAMPLE reservoir({int(rows)} ROWS) REPEATABLE ({int(seed)})")
+        return self._execute(sql, params).fetchdf()
+
+    # Esquema Arrow das colunas da seleção (o mesmo para todos os blocos exportados)
+    def arrow_schema(self):
+        return self._execute(f"SELECT * FROM {self._relation} LIMIT 0").arrow().schema
+
+    # Linhas filtradas em blocos (DataFrame, fração), para exportar sem materializar o resultado
+    def blocks(self, predicates=()):
+        total = self.count(predicates)
+        where, params = self._where(predicates)
+        cur = self._execute(f"SELECT * FROM {self._relation}{where}", params)
+        done = 0
+        while True:
+            block = cur.fetch_df_chunk(BATCH_VECTORS)
+            if block.empty and done:
+                break
+            done += len(block)
+            yield block, done / total if total else 1.0
+            if block.empty:
+                break
@@ -0,0 +1,142 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Gerador de planilhas operacionais sintéticas com as colunas que o dashboard espera
+# (KPIs, chaves do cubo, data/hora em texto DD/MM/AAAA, GPS, horímetro e status de manutenção),
+# produzidas em blocos para que 5M de linhas não precisem caber na memória de uma vez
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "5M": 5_000_000}
+XLSX_MAX_ROWS = 1_048_575
+CHUNK_ROWS = 100_000
+N_OPERATORS = 60
+N_EQUIPMENT = 40
+N_FIELDS = 200
+START = pd.Timestamp("2024-01-01")
+DAYS = 365
+FARM_CENTER = (-21.20, -48.30)
+STATUSES = np.array(["não", "sim", "pendente", "agendar"], dtype=object)
+STATUS_WEIGHTS = [0.94, 0.02, 0.025, 0.015]
+
+
+def parse_size(text):
+    return SIZES.get(text) or int(str(text).replace("_", ""))
+
+
+# Atributos fixos de operadores, equipamentos e talhões (mesma semente = mesma "frota")
+def _fleet(seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "skill": rng.normal(0, 4, N_OPERATORS),
+        "equipment_base_hours": rng.uniform(500, 6000, N_EQUIPMENT),
+        "equipment_use": rng.uniform(0.3, 0.7, N_EQUIPMENT),
+        "equipment_width": rng.choice([6.0, 9.0, 12.0, 18.0], N_EQUIPMENT),
+        "field_lat": FARM_CENTER[0] + rng.normal(0, 0.08, N_FIELDS),
+        "field_lon": FARM_CENTER[1] + rng.normal(0, 0.08, N_FIELDS),
+    }
+
+
+def _chunk(start, rows, total, fleet, rng):
+    index = np.arange(start, start + rows)
+    # Registros em ordem cronológica ao longo do período
+    elapsed = index / max(total, 1) * DAYS * 24
+    when = START + pd.to_timedelta(elapsed + rng.uniform(0, 0.5, rows), unit="h")
+    operator = rng.integers(0, N_OPERATORS, rows)
+    equipment = rng.integers(0, N_EQUIPMENT, rows)
+    field = rng.integers(0, N_FIELDS, rows)
+    efficiency = np.clip(rng.normal(65, 9, rows) + fleet["skill"][operator], 20, 99)
+    speed = np.clip(rng.normal(6.5, 1.4, rows), 1.0, 14.0)
+    effective_time = rng.gamma(2.0, 1.5, rows)
+    area = speed * effective_time * fleet["equipment_width"][equipment] / 10 * efficiency / 100
+    consumption = np.clip(rng.normal(11.5, 2.8, rows) - fleet["skill"][operator] / 4, 3.0, 30.0)
+    rpm = np.clip(rng.normal(1850, 160, rows), 900, 2400)
+    hourmeter = fleet["equipment_base_hours"][equipment] + elapsed * fleet["equipment_use"][equipment]
+    frame = pd.DataFrame({
+        "Data": when.strftime("%d/%m/%Y"),
+        "Hora": when.strftime("%H:%M:%S"),
+        "Fazenda": np.where(field < N_FIELDS // 2, "Fazenda Santa Rita", "Fazenda Boa Vista"),
+        "Talhão": np.char.add("T-", (field + 1).astype(str)),
+        "Operador": np.char.add("Operador ", (operator + 1).astype(str)),
+        "Equipamento": np.char.add("TR-", (equipment + 101).astype(str)),
+        "Turno": np.where(when.hour < 12, "A", np.where(when.hour < 20, "B", "C")),
+        "Eficiência de Motor (%)": efficiency.round(1),
+        "Área Operacional (ha)": area.round(3),
+        "Tempo Efetivo (h)": effective_time.round(2),
+        "Velocidade Média Efetiva (km/h)": speed.round(2),
+        "Consumo Médio (l/ha)": consumption.round(2),
+        "Consumo Médio Efetivo (l/h)": (consumption * area / np.maximum(effective_time, 0.05)).round(2),
+        "Rendimento Operacional (ha/h)": (area / np.maximum(effective_time, 0.05)).round(3),
+        "RPM Médio em Efetivo": rpm.round(0),
+        "Horimetro (h)": hourmeter.round(1),
+        "Status Manutenção": rng.choice(STATUSES, rows, p=STATUS_WEIGHTS),
+        "Latitude": (fleet["field_lat"][field] + rng.normal(0, 0.004, rows)).round(6),
+        "Longitude": (fleet["field_lon"][field] + rng.normal(0, 0.004, rows)).round(6),
+    })
+    return frame
+
+
+def iter_synthetic(rows, seed=0, chunk_rows=CHUNK_ROWS):
+    fleet = _fleet(seed)
+    rng = np.random.default_rng(seed + 1)
+    for start in range(0, rows, chunk_rows):
+        yield _chunk(start, min(chunk_rows, rows - start), rows, fleet, rng)
+
+
+def synthetic_frame(rows, seed=0):
+    return pd.concat(list(iter_synthetic(rows, seed)), ignore_index=True)
+
+
+# Grava no formato da extensão (.xlsx, .csv, .tsv ou .parquet), um bloco por vez
+def write_synthetic(path, rows, seed=0, sheet="Operações"):
+    kind = os.path.splitext(path)[1].lower().lstrip(".")
+    if kind == "xlsx" and rows > XLSX_MAX_ROWS:
+        raise ValueError(f"XLSX comporta no máximo {XLSX_MAX_ROWS} linhas; use CSV ou Parquet.")
+    chunks = iter_synthetic(rows, seed)
+    if kind in ("csv", "tsv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=i == 0, sep="\t" if kind == "tsv" else ",")
+    elif kind == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif kind == "xlsx":
+        import xlsxwriter
+        wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+        ws = wb.add_worksheet(sheet)
+        row = 0
+        try:
+            for chunk in chunks:
+                if row == 0:
+                    ws.write_row(0, 0, chunk.columns.tolist())
+                    row = 1
+                for record in chunk.itertuples(index=False):
+                    ws.write_row(row, 0, record)
+                    row += 1
+        finally:
+            wb.close()
+    else:
+        raise ValueError(f"Formato não suportado: {kind}")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera uma planilha operacional sintética.")
+    parser.add_argument("size", help="Número de linhas ou um de: " + ", ".join(SIZES))
+    parser.add_argument("path", help="Arquivo de saída (.xlsx, .csv, .tsv ou .parquet)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic(args.path, parse_size(args.size), args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import grouped_box_figure  # noqa: E402
+
+
+def _frame():
+    values = np.concatenate([np.linspace(10, 12, 50), [30.0, 40.0, -5.0], np.linspace(8, 9, 50), [25.0]])
+    return pd.DataFrame({"Operador": ["A"] * 53 + ["B"] * 51, "Consumo": values})
+
+
+def test_overlay_shows_only_the_real_outliers():
+    fig, elided = grouped_box_figure(_frame(), "Operador", "Consumo", budget=100)
+    assert elided == 0
+    assert sorted(fig.data[1].y) == [-5.0, 25.0, 30.0, 40.0]
+
+
+def test_outlier_cap_keeps_the_most_extreme_deterministically():
+    first, elided = grouped_box_figure(_frame(), "Operador", "Consumo", budget=2)
+    again, _ = grouped_box_figure(_frame(), "Operador", "Consumo", budget=2)
+    assert elided == 2
+    assert sorted(first.data[1].y) == [30.0, 40.0]
+    assert list(first.data[1].y) == list(again.data[1].y)
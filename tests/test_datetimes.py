@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetimes import detect_datetimes, numeric_columns  # noqa: E402
+from filters import filter_columns  # noqa: E402
+from synthetic import synthetic_frame  # noqa: E402
+
+
+def test_date_and_time_columns_are_combined():
+    df = pd.DataFrame({
+        "Data": ["01/02/2024", "02/02/2024", "03/02/2024"],
+        "Hora": ["06:30:00", "14:05:10", "22:59:59"],
+        "Área Operacional (ha)": [1.5, 2.0, 0.75],
+    })
+    out, report = detect_datetimes(df)
+    assert pd.api.types.is_datetime64_any_dtype(out["Data Hora"])
+    assert out["Data Hora"].iloc[1] == pd.Timestamp("2024-02-02 14:05:10")
+    assert pd.api.types.is_timedelta64_dtype(out["Hora"])
+    assert "combinada" in set(report["Status"])
+    assert numeric_columns(out) == ["Área Operacional (ha)"]
+    cat_cols, num_cols, date_cols = filter_columns(out)
+    assert "Hora" not in cat_cols + num_cols + date_cols
+
+
+def test_synthetic_sheet_has_no_duration_columns_among_numbers():
+    out, _ = detect_datetimes(synthetic_frame(500))
+    cat_cols, num_cols, _ = filter_columns(out)
+    assert "Hora" not in num_cols and "Hora" not in cat_cols
+    assert all(not pd.api.types.is_timedelta64_dtype(out[col]) for col in num_cols)
+    assert pd.api.types.is_datetime64_any_dtype(out["Data Hora"])
+
+
+def test_native_time_column_is_excluded_from_numbers():
+    df = pd.DataFrame({"Duração": pd.to_timedelta(["01:00:00", "02:30:00"]), "RPM": [1800, 1900]})
+    assert numeric_columns(df) == ["RPM"]
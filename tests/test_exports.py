@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exports  # noqa: E402
+from exports import EXPORT_CHUNK_ROWS, export_excel, export_parquet, export_path  # noqa: E402
+
+
+# Cache e exportações num diretório próprio de cada teste, criado sob demanda
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANALYZER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(exports, "EXPORT_DIR", str(tmp_path / "exports"))
+    return tmp_path / "exports"
+
+
+def test_parquet_schema_comes_from_the_whole_frame():
+    pq = pytest.importorskip("pyarrow.parquet")
+    obs = [None] * EXPORT_CHUNK_ROWS + ["troca de óleo"]
+    df = pd.DataFrame({"Observação": obs, "Horimetro (h)": range(len(obs))})
+    path = export_parquet(df, export_path("dados", "parquet"))
+    table = pq.read_table(path)
+    assert str(table.schema.field("Observação").type) == "string"
+    assert table.column("Observação")[-1].as_py() == "troca de óleo"
+
+
+def test_excel_keeps_the_index():
+    pytest.importorskip("xlsxwriter")
+    pytest.importorskip("openpyxl")
+    df = pd.DataFrame({"Operador": ["A", "B"], "Área Operacional (ha)": [1.5, 2.0]}, index=[7, 42])
+    path = export_excel(df, export_path("dados", "xlsx"))
+    back = pd.read_excel(path, index_col=0)
+    assert back.index.tolist() == [7, 42]
+    assert back.columns.tolist() == ["Operador", "Área Operacional (ha)"]
+
+
+def test_export_outside_the_export_dir_before_it_exists(tmp_path, export_dir):
+    pytest.importorskip("pyarrow")
+    path = export_parquet(pd.DataFrame({"RPM": [1800.0]}), str(tmp_path / "avulso.parquet"))
+    assert os.path.exists(path)
+    assert not export_dir.exists()
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import IndicatorError, compile_indicator  # noqa: E402
+
+AREA = "Área Operacional (ha)"
+
+
+def test_integer_constants_use_float_power():
+    df = pd.DataFrame({AREA: [1.0, 2.0, 3.0]})
+    result = compile_indicator(f"mean(2 ** -1 * [{AREA}])", [AREA]).evaluate(df)
+    assert np.allclose(result, 1.0)
+
+
+def test_numeric_failures_raise_indicator_error(monkeypatch):
+    import indicators
+
+    df = pd.DataFrame({AREA: [1.0, 2.0]})
+    indicator = compile_indicator(f"[{AREA}] * 2", [AREA])
+
+    def fail(*args, **kwargs):
+        raise FloatingPointError("overflow")
+
+    monkeypatch.setattr(indicators, "numexpr", None)
+    monkeypatch.setitem(indicators._BIN_OPS, indicators.ast.Mult, fail)
+    with pytest.raises(IndicatorError):
+        indicator.evaluate(df)
+
+
+def test_division_by_zero_gives_null_like_the_sql_path():
+    df = pd.DataFrame({AREA: [1.0, 2.0, 3.0], "RPM Médio em Efetivo": [1850.0, 1900.0, 1850.0]})
+    result = compile_indicator(f"[{AREA}] / ([RPM Médio em Efetivo] - 1850)", [AREA, "RPM Médio em Efetivo"]).evaluate(df)
+    assert result.isna().tolist() == [True, False, True]
+    assert np.isfinite(result.dropna()).all()
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import _coerce, _numeric_dtype, _Widen  # noqa: E402
+
+
+def test_float32_only_when_values_round_trip():
+    assert _numeric_dtype("Tempo Efetivo (h)", pd.Series([0.5, 1.25, np.nan])) == "float32"
+    assert _numeric_dtype("Horimetro (h)", pd.Series([1234.56, 7.1])) == "float64"
+
+
+def test_block_that_does_not_round_trip_widens_to_float64():
+    chunk = pd.DataFrame({"Horimetro (h)": [0.5, 4321.1]})
+    with pytest.raises(_Widen) as info:
+        _coerce(chunk, {"Horimetro (h)": "float32"}, {})
+    assert info.value.changes == {"Horimetro (h)": "float64"}
+
+
+def test_all_widenings_of_a_block_are_reported_together():
+    chunk = pd.DataFrame({"Horimetro (h)": [0.5, 4321.1], "RPM": [1800, 70_000], "Obs": ["1", "troca"]})
+    with pytest.raises(_Widen) as info:
+        _coerce(chunk, {"Horimetro (h)": "float32", "RPM": "Int16", "Obs": "Int16"}, {})
+    assert info.value.changes == {"Horimetro (h)": "float64", "RPM": "Int32", "Obs": "string"}
+
+
+def test_numeric_widening_reads_the_source_once(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import ingest
+
+    path = tmp_path / "dados.csv"
+    rpm = [1800] * 50 + [70_000] * 50
+    hours = [0.5] * 50 + [4321.1] * 50
+    pd.DataFrame({"RPM": rpm, "Horimetro (h)": hours}).to_csv(path, index=False)
+    passes = []
+    original = ingest.iter_chunks
+
+    def counting(*args, **kwargs):
+        passes.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(ingest, "SAMPLE_ROWS", 10)
+    monkeypatch.setattr(ingest, "iter_chunks", counting)
+    target = str(tmp_path / "dados.parquet")
+    dtypes = ingest.ingest_to_parquet(str(path), "csv", None, target, chunk_rows=20)
+    assert len(passes) == 2  # amostra + uma única passagem de escrita
+    assert dtypes == {"RPM": "Int32", "Horimetro (h)": "float64"}
+    back = ingest.read_parquet(target)
+    assert back["RPM"].tolist() == rpm
+    assert back["Horimetro (h)"].tolist() == hours
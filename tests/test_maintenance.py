@@ -0,0 +1,46 @@
+import os
+import sys
+import warnings
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import maintenance  # noqa: E402
+from maintenance import RECOMPUTED, SINCE_SERVICE, RulesEngine  # noqa: E402
+
+
+def _sheet(hours):
+    return pd.DataFrame({
+        "Equipamento": ["TR-1", "TR-1", "TR-2", "TR-2"],
+        "Horimetro (h)": hours,
+        "Status Manutenção": ["não", "sim", "não", "não"],
+    })
+
+
+def test_recomputed_count_is_per_call():
+    engine = RulesEngine("Horimetro (h)", "Status Manutenção", "Equipamento")
+    first = engine.metrics(_sheet([10.0, 20.0, 5.0, 9.0]))
+    assert first.attrs[RECOMPUTED] == 2
+    assert first.loc["TR-2", SINCE_SERVICE] == 4.0
+    again = engine.metrics(_sheet([10.0, 20.0, 5.0, 9.0]))
+    assert again.attrs[RECOMPUTED] == 0
+    changed = engine.metrics(_sheet([10.0, 20.0, 5.0, 12.0]))
+    assert changed.attrs[RECOMPUTED] == 1
+
+
+def test_full_recompute_does_not_concat_empty_frames():
+    engine = RulesEngine("Horimetro (h)", "Status Manutenção", "Equipamento")
+    engine.metrics(_sheet([10.0, 20.0, 5.0, 9.0]))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        table = engine.metrics(_sheet([11.0, 21.0, 6.0, 10.0]))
+    assert table.attrs[RECOMPUTED] == 2
+
+
+def test_memo_keeps_only_recent_service_sets(monkeypatch):
+    monkeypatch.setattr(maintenance, "MEMO_SIZE", 2)
+    engine = RulesEngine("Horimetro (h)", "Status Manutenção", "Equipamento")
+    for service in (("sim",), ("feita",), ("realizada",)):
+        engine.metrics(_sheet([10.0, 20.0, 5.0, 9.0]), service)
+    assert list(engine._memo) == [("feita",), ("realizada",)]
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sheet_cache  # noqa: E402
+
+
+def _workbook(root, name, size, mtime):
+    path = os.path.join(root, "workbooks", name)
+    os.makedirs(path)
+    with open(os.path.join(path, "sheet_0.parquet"), "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_prune_removes_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", str(tmp_path))
+    _workbook(tmp_path, "antiga", 100, 1_000)
+    _workbook(tmp_path, "media", 100, 2_000)
+    _workbook(tmp_path, "recente", 100, 3_000)
+    assert sheet_cache.prune_workbooks(max_bytes=150) == ["antiga", "media"]
+    assert os.listdir(tmp_path / "workbooks") == ["recente"]
+
+
+def test_prune_keeps_the_current_workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", str(tmp_path))
+    _workbook(tmp_path, "atual", 100, 1_000)
+    _workbook(tmp_path, "outra", 100, 2_000)
+    assert sheet_cache.prune_workbooks(max_bytes=150, keep=("atual",)) == ["outra"]
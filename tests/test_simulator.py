@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import build_cube, cube_keys  # noqa: E402
+from simulator import SIM_METRICS, draw, fit_distributions, simulate  # noqa: E402
+from synthetic import synthetic_frame  # noqa: E402
+
+
+def _fit():
+    df = synthetic_frame(20_000)
+    metrics = list(SIM_METRICS.values()) + ["Rendimento Operacional (ha/h)"]
+    return df, fit_distributions(build_cube(df, cube_keys(df.columns), metrics), "Operador")
+
+
+def test_positive_metrics_have_no_mass_at_zero():
+    df, fit = _fit()
+    draws = draw(fit, 50_000)
+    for name in ("area", "consumo", "velocidade"):
+        values, real = draws[name], df[SIM_METRICS[name]]
+        assert (values > 0).all()
+        assert abs(values.mean() / real.mean() - 1) < 0.05
+        assert 0.75 < values.std() / real.std() < 1.25
+    assert ((draws["eficiencia"] >= 0.1) & (draws["eficiencia"] <= 100)).all()
+
+
+def test_scenario_percentiles_are_not_pinned_to_zero():
+    _, fit = _fit()
+    draws = draw(fit, 50_000)
+    table = simulate(fit, draws, {"consumo": fit["overall"]["consumo"] * 0.9}).set_index("Saída")
+    assert (table["Real P5"].dropna() > 0).all()
+    assert (table["Simulado P5"].drop(index="Economia por operação (l)", errors="ignore") > 0).all()
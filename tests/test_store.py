@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("duckdb")
+
+from datetimes import detect_datetimes  # noqa: E402
+from maintenance import HOURMETER, RECORDS, SERVICED, SINCE_SERVICE, STATUS, RulesEngine  # noqa: E402
+from store import AnalyticalStore, StoreView  # noqa: E402
+from synthetic import synthetic_frame  # noqa: E402
+
+COLUMNS = ("Horimetro (h)", "Status Manutenção", "Equipamento", "Data Hora")
+
+
+def test_equipment_metrics_match_the_rules_engine_on_all_rows(tmp_path):
+    frame, _ = detect_datetimes(synthetic_frame(3_000))
+    store = AnalyticalStore(str(tmp_path / "base.duckdb"))
+    table = store.append(frame, "hash", "sintetico.csv", "Operações")
+    view = StoreView(store, table, tuple(store.sources(table)["fonte"]))
+    metrics = view.equipment_metrics((), *COLUMNS).sort_index()
+    expected = RulesEngine(*COLUMNS).metrics(frame).sort_index()
+    assert metrics.index.tolist() == expected.index.tolist()
+    assert metrics[RECORDS].tolist() == expected[RECORDS].tolist()
+    assert metrics[STATUS].tolist() == expected[STATUS].tolist()
+    assert metrics[SERVICED].tolist() == expected[SERVICED].tolist()
+    assert np.allclose(metrics[HOURMETER], expected[HOURMETER])
+    assert np.allclose(metrics[SINCE_SERVICE], expected[SINCE_SERVICE])
+    counts = view.status_counts((), "Status Manutenção")
+    assert counts.sum() == len(frame)